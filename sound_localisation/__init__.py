@@ -0,0 +1,7 @@
+"""
+TATA Steel sound localisation.
+
+Run `python -m sound_localisation --help` for the commands. Submodules
+import their heavy dependencies (numpy, scipy, pyaudio) themselves, so
+importing the package is cheap.
+"""
@@ -0,0 +1,116 @@
+"""
+Where does the noise come from: a decaying map of the sound energy per
+direction.
+
+The map has AZIMUTH_BINS x ELEVATION_BINS bins (the azimuth bins are the
+sectors of the demo dial). Every estimate adds its energy, 10^(L/10)
+weighted by its confidence, to one bin, and older contributions fade with
+TIME_CONSTANT. The fading is never applied to the whole map: contributions
+are stored multiplied by e^((t - reference) / TIME_CONSTANT), so an update
+only touches its own bin and the map is scaled back only when that factor
+gets large, about once every RESCALE time constants.
+
+`python -m sound_localisation activity` builds the map from the estimate
+stream and saves a snapshot in the data folder every SNAPSHOT_INTERVAL.
+"""
+
+import math
+import os
+import socket
+import time
+import numpy as np
+
+from . import config
+from . import stream
+
+
+# === Activity Map Configuration ===
+AZIMUTH_BINS = 72               # Like SECTORS_COUNT of the demo
+ELEVATION_BINS = 18             # theta 0-180 degrees in 10 degree bins
+TIME_CONSTANT = 8 * 3600.0      # Seconds, about a shift
+RESCALE = 50                    # Time constants before the stored values are scaled back
+SNAPSHOT_INTERVAL = 60.0        # Seconds between saved snapshots
+SNAPSHOT_FILE = "activity.npz"
+
+
+class ActivityMap:
+    """Exponentially decaying energy per azimuth and elevation bin."""
+
+    def __init__(self, time_constant=TIME_CONSTANT, azimuth_bins=AZIMUTH_BINS, elevation_bins=ELEVATION_BINS):
+        self.time_constant = time_constant
+        self.values = np.zeros((azimuth_bins, elevation_bins))
+        self.reference = None       # Time at which the stored values are the real ones
+
+    def bin(self, azimuth, theta):
+        """Bin of an azimuth (degrees, any range) and theta (degrees, 0-180)."""
+        azimuth_bins, elevation_bins = self.values.shape
+        i = int(azimuth % 360 * azimuth_bins / 360) % azimuth_bins
+        j = min(max(int(theta * elevation_bins / 180), 0), elevation_bins - 1)
+        return i, j
+
+    def add(self, timestamp, azimuth, theta, level, confidence=1.0):
+        """Add an estimate: directions in degrees, level in dB."""
+        if self.reference is None:
+            self.reference = timestamp
+        exponent = (timestamp - self.reference) / self.time_constant
+        if exponent > RESCALE:
+            self.rescale(timestamp)
+            exponent = 0.0
+        self.values[self.bin(azimuth, theta)] += confidence * 10 ** (level / 10) * math.exp(exponent)
+
+    def rescale(self, timestamp):
+        self.values *= math.exp(-(timestamp - self.reference) / self.time_constant)
+        self.reference = timestamp
+
+    def snapshot(self, timestamp=None):
+        """The decayed energies at timestamp (now by default), a copy."""
+        if self.reference is None:
+            return np.zeros_like(self.values)
+        timestamp = time.time() if timestamp is None else timestamp
+        return self.values * math.exp(-(timestamp - self.reference) / self.time_constant)
+
+    def save(self, path, timestamp=None):
+        """Write a snapshot: the energies, the fraction per bin and the bin edges."""
+        timestamp = time.time() if timestamp is None else timestamp
+        energy = self.snapshot(timestamp)
+        total = energy.sum()
+        azimuth_bins, elevation_bins = energy.shape
+        temporary = path + ".tmp.npz"
+        np.savez(temporary, time=timestamp, time_constant=self.time_constant, energy=energy,
+                 fraction=energy / total if total > 0 else energy,
+                 azimuth_edges=np.linspace(0, 360, azimuth_bins + 1),
+                 theta_edges=np.linspace(0, 180, elevation_bins + 1))
+        os.replace(temporary, path)
+
+    def top(self, count=5, timestamp=None):
+        """The count azimuth sectors with the most energy, as (from, to degrees, fraction)."""
+        per_azimuth = self.snapshot(timestamp).sum(axis=1)
+        total = per_azimuth.sum()
+        width = 360 / len(per_azimuth)
+        return [(i * width, (i + 1) * width, per_azimuth[i] / total)
+                for i in np.argsort(per_azimuth)[::-1][:count] if total > 0 and per_azimuth[i] > 0]
+
+
+def run(address=(stream.DEFAULT_HOST, stream.DEFAULT_PORT), family=socket.AF_INET, path=None):
+    """Build the map from a running publisher until interrupted."""
+    path = path or os.path.join(config.data_dir(), SNAPSHOT_FILE)
+    activity = ActivityMap()
+    subscriber = stream.EstimateSubscriber(address, family)
+    last_snapshot = time.monotonic()
+    try:
+        for estimate in subscriber:
+            # Relative to north with a compass, relative to the array without.
+            azimuth = math.degrees(estimate.phi)
+            if not math.isnan(estimate.heading):
+                azimuth = estimate.heading - azimuth
+            level = 10 * math.log10(np.mean(np.power(10, np.asarray(estimate.spl) / 10)))
+            activity.add(estimate.timestamp, azimuth, math.degrees(estimate.theta), level, estimate.confidence)
+            if time.monotonic() - last_snapshot > SNAPSHOT_INTERVAL:
+                last_snapshot = time.monotonic()
+                activity.save(path, estimate.timestamp)
+                print(", ".join(f"{low:.0f}-{high:.0f} deg {fraction:.0%}" for low, high, fraction in activity.top()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
+        activity.save(path)
@@ -0,0 +1,150 @@
+"""
+Watches the data folder for new recordings. For every new multichannel
+wav file the phi and theta of the sound are calculated and added to a csv
+in the same folder.
+
+With the result store (memo.py) a recording is new when its content is:
+the hash of the audio is the last column of the csv, so a recording that
+is replaced by one with the same name is analysed again. Files are only
+hashed again when their size or modification time changes.
+"""
+
+import csv
+import os
+import time
+import wave
+import numpy as np
+
+from . import codec
+from . import config
+from .localise import process_window
+
+
+RESULTS_FILE = "localisation.csv"
+POLL_INTERVAL = 0.5
+
+
+def control_new_wav(folder):
+    return {file for file in os.listdir(folder) if file.endswith((".wav", codec.SUFFIX))}
+
+
+def read_wav(path):
+    """Return the samples of a 32 bit wav file, or a compressed .tsl file, as
+    an int32 (frames, channels) array and its sample rate."""
+    if path.endswith(codec.SUFFIX):
+        reader = codec.CodecReader(path)
+        return reader.read(), reader.rate
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 4:
+            raise ValueError(f"{path} is not a 32 bit recording")
+        data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int32)
+        return data.reshape(-1, wf.getnchannels()), wf.getframerate()
+
+
+def analyse_file(path, offset, cache=None):
+    """Return phi and theta in degrees, the confidence and the SPL per channel.
+    With a features.FeatureCache the cached spectra are used."""
+    if cache is not None:
+        from . import features
+
+        cached = cache.get(path)
+        if cached.energy.shape[0] < 4:
+            raise ValueError(f"{path} has {cached.energy.shape[0]} channels, 4 are needed")
+        phi, theta, confidence, spl = features.localise(cached, offset)
+        return np.rad2deg(phi), np.rad2deg(theta), confidence, spl
+
+    data, _ = read_wav(path)
+    if data.shape[1] < 4:
+        raise ValueError(f"{path} has {data.shape[1]} channels, 4 are needed")
+    phi, theta, confidence, spl = process_window(data.astype(np.float32), offset)
+    return np.rad2deg(phi), np.rad2deg(theta), confidence, spl
+
+
+def analyse_memoized(path, offset, cache, store, geometry=None, audio=None):
+    """analyse_file, returning the stored result when the recording, the
+    settings and the code didn't change (see memo.py). audio is the
+    content_hash of the recording, if known."""
+    parameters = {"offset": offset, "frame": cache.frame if cache is not None else None, "geometry": geometry}
+
+    def compute():
+        phi, theta, confidence, spl = analyse_file(path, offset, cache)
+        return [float(phi), float(theta), float(confidence), [float(level) for level in spl]]
+
+    return tuple(store.memoize(path, parameters, compute, audio))
+
+
+class ContentHashes:
+    """memo.content_hash per file, computed again only when the size or the
+    modification time of the file changed."""
+
+    def __init__(self):
+        self.known = {}
+
+    def __call__(self, path):
+        from .memo import content_hash
+
+        status = os.stat(path)
+        signature = (status.st_size, status.st_mtime_ns)
+        known = self.known.get(path)
+        if known is None or known[0] != signature:
+            known = self.known[path] = (signature, content_hash(path))
+        return known[1]
+
+
+def run(folder=None, once=False, cache=False, memo=True):
+    """Analyse every recording that appears in folder, until interrupted."""
+    settings = config.load()
+    folder = folder or config.data_dir(settings)
+    if cache:
+        from .features import FeatureCache
+
+        cache = FeatureCache(settings=settings)
+    else:
+        cache = None
+    store = None
+    if memo:
+        from .memo import ResultStore
+
+        store = ResultStore(settings=settings)
+        hashes = ContentHashes()
+    results = os.path.join(folder, RESULTS_FILE)
+    # Names without the store, (name, content hash) with it.
+    done = set()
+    if os.path.exists(results):
+        with open(results, newline='') as file:
+            done = {(row[0], row[-1]) if store is not None else row[0] for row in csv.reader(file) if row}
+
+    try:
+        while True:
+            for name in sorted(control_new_wav(folder)):
+                path = os.path.join(folder, name)
+                audio = None
+                if store is not None:
+                    try:
+                        audio = hashes(path)
+                    except FileNotFoundError:
+                        continue
+                entry = (name, audio) if store is not None else name
+                if entry in done:
+                    continue
+                done.add(entry)
+                try:
+                    if store is not None:
+                        phi, theta, confidence, spl = analyse_memoized(path, settings["offset"], cache, store,
+                                                                       settings["geometry"], audio)
+                    else:
+                        phi, theta, confidence, spl = analyse_file(path, settings["offset"], cache)
+                except ValueError as error:
+                    print(error)
+                    continue
+                row = [name, f"{phi:.1f}", f"{theta:.1f}", f"{confidence:.3f}", *(f"{level:.1f}" for level in spl)]
+                if audio is not None:
+                    row.append(audio)
+                with open(results, "a", newline='') as file:
+                    csv.writer(file).writerow(row)
+                print(f"{name}: phi {phi:.1f} graden, theta {theta:.1f} graden")
+            if once:
+                break
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
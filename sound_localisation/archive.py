@@ -0,0 +1,187 @@
+"""
+Continuous archive of the full 4 channel stream within a disk budget.
+
+The stream is written in segment files of SEGMENT_SEC seconds in the
+archive folder of the data folder, named after the time of their first
+frame (segment_<milliseconds since epoch>.raw, raw int32 frames). The
+audio is written WRITE_SEC at a time, so the SD card gets large
+sequential writes. When a segment is full its envelope is saved next to it
+(see envelope.py) and the oldest segments are deleted until the archive
+fits in the budget again. After an input overflow a new segment is
+started, so the time of every frame follows from its segment.
+
+fetch() returns any time range as memory mapped views, one per segment
+the range touches, without reading or copying the audio.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+import wave
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+from .envelope import EnvelopeWriter, sidecar_path
+
+
+# === Archive Configuration ===
+SEGMENT_SEC = 60            # Seconds per segment file
+WRITE_SEC = 1.0             # Seconds of audio written at once
+BUDGET_GB = 8.0             # Disk space of the archive, envelopes included
+PA_INPUT_OVERFLOW = 2       # pyaudio.paInputOverflow
+
+SEGMENT_NAME = re.compile(r"segment_(\d+)\.raw$")
+FRAME_BYTES = 4 * audio_device.CHANNELS
+
+
+def archive_dir(settings=None):
+    return os.path.join(config.data_dir(settings), "archive")
+
+
+def segments(folder=None):
+    """Return (start in seconds, path) of every segment, oldest first."""
+    folder = folder or archive_dir()
+    found = []
+    for name in os.listdir(folder):
+        match = SEGMENT_NAME.match(name)
+        if match:
+            found.append((int(match.group(1)) / 1000, os.path.join(folder, name)))
+    return sorted(found)
+
+
+def fetch(start, end, folder=None, channels=audio_device.CHANNELS, rate=audio_device.SAMPLE_RATE):
+    """Return (start in seconds, (frames, channels) memmap view) for every
+    segment between start and end seconds. Gaps in the archive are gaps
+    between the pieces."""
+    pieces = []
+    for segment_start, path in segments(folder):
+        frames = os.path.getsize(path) // (4 * channels)
+        if frames == 0 or segment_start >= end or segment_start + frames / rate <= start:
+            continue
+        data = np.memmap(path, dtype=np.int32, mode='r', shape=(frames, channels))
+        first = max(0, int(round((start - segment_start) * rate)))
+        last = min(frames, int(round((end - segment_start) * rate)))
+        if first < last:
+            pieces.append((segment_start + first / rate, data[first:last]))
+    return pieces
+
+
+def export_wav(start, end, filename, folder=None):
+    """Write a time range of the archive to a 32 bit wav file, gaps left out."""
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(audio_device.CHANNELS)
+        wf.setsampwidth(4)
+        wf.setframerate(audio_device.SAMPLE_RATE)
+        for _, data in fetch(start, end, folder):
+            wf.writeframes(np.ascontiguousarray(data).tobytes())
+
+
+class Archive:
+    """Writes the stream into segment files until stopped."""
+
+    def __init__(self, folder=None, budget_gb=BUDGET_GB, segment_sec=SEGMENT_SEC):
+        self.folder = folder or archive_dir()
+        self.budget = int(budget_gb * 1e9)
+        self.segment_frames = int(segment_sec * audio_device.SAMPLE_RATE)
+        self.write_frames = int(WRITE_SEC * audio_device.SAMPLE_RATE)
+        self.blocks = queue.Queue()
+        self.stream = None
+        self.writer = None
+
+    def callback(self, in_data, frame_count, time_info, status):
+        self.blocks.put_nowait((time.time() - frame_count / audio_device.SAMPLE_RATE, in_data,
+                                bool(status & PA_INPUT_OVERFLOW)))
+        return (None, audio_device.PA_CONTINUE)
+
+    def start(self, audio):
+        os.makedirs(self.folder, exist_ok=True)
+        self.writer = threading.Thread(target=self.run, daemon=True)
+        self.writer.start()
+        self.stream = audio_device.open_input(audio, self.callback)
+        self.stream.start_stream()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+        self.blocks.put(None)
+        self.writer.join()
+
+    def run(self):
+        file = None
+        path = None
+        envelope = None
+        written = 0             # Frames in the current segment
+        pending = []
+        pending_frames = 0
+
+        def write():
+            nonlocal pending, pending_frames
+            file.write(b''.join(pending))
+            pending = []
+            pending_frames = 0
+
+        def close():
+            nonlocal file
+            write()
+            file.close()
+            file = None
+            envelope.save(path)
+            self.prune()
+
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                break
+            timestamp, data, overflow = block
+            frames = len(data) // FRAME_BYTES
+            if file is not None and (overflow or written >= self.segment_frames):
+                close()
+            if file is None:
+                path = os.path.join(self.folder, f"segment_{int(timestamp * 1000)}.raw")
+                file = open(path, "wb", buffering=0)
+                envelope = EnvelopeWriter(audio_device.CHANNELS)
+                written = 0
+            pending.append(data)
+            pending_frames += frames
+            written += frames
+            envelope.add(np.frombuffer(data, dtype=np.int32).reshape(-1, audio_device.CHANNELS))
+            if pending_frames >= self.write_frames:
+                write()
+        if file is not None:
+            close()
+
+    def prune(self):
+        """Delete the oldest segments until the archive fits in the budget."""
+        found = segments(self.folder)
+        sizes = [os.path.getsize(path) + (os.path.getsize(sidecar_path(path))
+                                          if os.path.exists(sidecar_path(path)) else 0)
+                 for _, path in found]
+        total = sum(sizes)
+        # The newest segment is never deleted.
+        for (_, path), size in zip(found[:-1], sizes):
+            if total <= self.budget:
+                break
+            os.remove(path)
+            if os.path.exists(sidecar_path(path)):
+                os.remove(sidecar_path(path))
+            total -= size
+
+
+def run(folder=None, budget_gb=BUDGET_GB, segment_sec=SEGMENT_SEC):
+    """Archive until interrupted."""
+    audio = audio_device.open_audio()
+    archive = Archive(folder, budget_gb, segment_sec)
+    archive.start(audio)
+    print(f"Archiving to {archive.folder}, at most {budget_gb} GB. Press Ctrl+C to stop.")
+    try:
+        while archive.stream.is_active():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        archive.stop()
+        audio.terminate()
@@ -0,0 +1,76 @@
+"""
+Audio settings of the i2smaster TDM device and helpers to open it.
+
+pyaudio is only imported when a stream is opened, so commands that don't
+touch the device (and --help) start without loading PortAudio.
+
+The device and its frames_per_buffer come from the configuration the
+devices command probed (see devices.py). It is stored with a fingerprint
+of the device, so the device is found again after its index changed and
+a different device or PortAudio build is never used with stale settings.
+
+When a capture hub is running (see hub.py) the hub owns the device, and
+open_input reads from it instead, unless a device is asked for explicitly.
+"""
+
+import hashlib
+
+from . import config
+
+
+# === Audio Configuration ===
+SAMPLE_RATE = 48000         # Sample rate in Hz
+CHANNELS = 4                # TDM slots of the i2smaster device
+CHUNK = 4800                # Frames per buffer
+PA_CONTINUE = 0             # pyaudio.paContinue, callbacks return it without importing pyaudio
+
+
+def open_audio():
+    import pyaudio
+
+    return pyaudio.PyAudio()
+
+
+def device_fingerprint(info):
+    """Identifies a device across reboots, where its index may change."""
+    import pyaudio
+
+    text = "|".join(str(value) for value in (pyaudio.get_portaudio_version_text(), info["name"], info["hostApi"],
+                                             info["maxInputChannels"], info["defaultSampleRate"]))
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def configured_device(audio, settings=None):
+    """Return the device index and the probed frames_per_buffer.
+
+    Without a probed configuration, or when its device is gone, this is
+    dev_index from the settings and None.
+    """
+    settings = settings or config.load()
+    probed = settings.get("device")
+    if probed:
+        for i in range(audio.get_device_count()):
+            if device_fingerprint(audio.get_device_info_by_index(i)) == probed["fingerprint"]:
+                return i, probed["frames_per_buffer"]
+    return settings["dev_index"], None
+
+
+def open_input(audio, callback, channels=CHANNELS, rate=SAMPLE_RATE, frames_per_buffer=None,
+               dev_index=None, sample_format=None):
+    """Open a callback input stream, 32 bit by default. The device and
+    frames_per_buffer default to the configured ones."""
+    import pyaudio
+
+    from . import hub
+
+    if dev_index is None and sample_format is None and rate == SAMPLE_RATE and hub.is_running():
+        return hub.HubStream(callback, channels, frames_per_buffer or configured_device(audio)[1] or CHUNK)
+
+    if dev_index is None or frames_per_buffer is None:
+        configured_index, configured_frames = configured_device(audio)
+        if dev_index is None:
+            dev_index = configured_index
+        frames_per_buffer = frames_per_buffer or configured_frames or CHUNK
+    return audio.open(format=sample_format or pyaudio.paInt32, rate=rate, channels=channels,
+                      input_device_index=dev_index, input=True,
+                      frames_per_buffer=frames_per_buffer, stream_callback=callback)
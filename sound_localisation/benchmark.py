@@ -0,0 +1,322 @@
+"""
+Performance baseline of the localisation pipeline.
+
+Every stage runs on the same fixed inputs: a synthetic take (seeded noise
+with impacts and a tone from a known direction) and any recordings given.
+Per stage and input the suite reports the time per second of audio (the
+median of at least REPEAT runs, more for the fast stages until they ran
+MIN_TIMED_SEC), the peak of the memory allocated during a run (measured
+in a separate run under tracemalloc, numpy reports its buffers to it) and
+the peak RSS. Every stage runs in a fresh process, so its peak RSS doesn't
+depend on the stages that ran before it; that includes the interpreter,
+numpy and scipy, the same for every stage.
+
+The stages:
+
+    replay      the recorder callback on every block, the always-on trigger path
+    filtering   band-pass and A-weighting filters of a sweep level measurement
+    tdoa        GCC-PHAT lags of all pairs for every window the demo analyses
+    angles      the least squares direction, phi and theta of those lags
+    metering    Leq per block and A-weighted fast SPLMeter
+    events      saving and localising events, with their envelope and json
+    pipeline    the demo pipeline worker end to end, fed block by block without waiting
+
+The results are compared with the budgets in BUDGETS_FILE: a stage passes
+when all three numbers are within its budget. The budgets are only
+enforced on the hardware they were measured on (the board model, or the
+CPU model elsewhere, see machine()), anywhere else they are shown for
+comparison. No budgets are shipped: --save stores the results times
+MARGIN as the budgets, run it on the Raspberry Pi the array is deployed
+on and commit the file.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import queue
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+from . import spl
+from .geometry import from_settings
+from .localise import direction_to_angles, get_lags
+
+
+# === Benchmark Configuration ===
+SYNTHETIC_SEC = 10          # Length of the synthetic take
+SYNTHETIC_DELAYS = (3, -2, 4)   # Samples of channel 2, 3 and 1 after channel 0, a direction of the default geometry
+EVENT_SEC = 5               # Length of the events written by the events stage
+REPEAT = 5                  # Timed runs per stage at least, the median counts
+MIN_TIMED_SEC = 2.0         # Fast stages are repeated until they ran this long
+MAX_REPEAT = 100            # Timed runs per stage at most
+MARGIN = 1.25               # Budgets are the saved results times this
+BUDGETS_FILE = os.path.join(config.PACKAGE_DIR, "benchmark.json")
+
+
+def synthetic(seconds=SYNTHETIC_SEC, rate=audio_device.SAMPLE_RATE, delays=SYNTHETIC_DELAYS, seed=0):
+    """A reproducible int32 (frames, 4) take: noise, an impact every second
+    and a 1 kHz tone, arriving with the given sample delays."""
+    random = np.random.default_rng(seed)
+    frames = int(seconds * rate)
+    source = 0.05 * random.standard_normal(frames)
+    source += 0.05 * np.sin(2 * np.pi * 1000 * np.arange(frames) / rate)
+    decay = np.exp(-np.arange(rate // 20) / (rate / 200))
+    for start in range(rate // 2, frames - len(decay), rate):
+        source[start:start + len(decay)] += 0.5 * decay * random.standard_normal(len(decay))
+    take = np.empty((frames, 4))
+    take[:, 0] = source
+    for channel, delay in zip((2, 3, 1), delays):
+        take[:, channel] = np.roll(source, delay)
+    take += 0.005 * random.standard_normal(take.shape)
+    return (np.clip(take, -1, 1 - 2**-31) * 2**31).astype(np.int32)
+
+
+def load_input(path):
+    from .analyse import read_wav
+
+    data, _ = read_wav(path)
+    return data
+
+
+def blocks_of(data, chunk=audio_device.CHUNK):
+    """The take as the byte blocks a stream callback gets."""
+    return [data[start:start + chunk].tobytes() for start in range(0, len(data) - chunk + 1, chunk)]
+
+
+def windows_of(data):
+    """The windows the demo pipeline analyses, as float32 like its ring."""
+    from .pipeline import HOP, WINDOW
+
+    return [data[end - WINDOW:end].astype(np.float32) for end in range(WINDOW, len(data) + 1, HOP)]
+
+
+# Every stage takes the input and returns the function that is timed.
+
+def replay_stage(data, settings, folder):
+    from . import recorder
+
+    blocks = blocks_of(data)
+    session = recorder.Recorder(threshold_db=np.inf, data_dir=folder, settings=settings)
+    session.set_chunk(audio_device.CHUNK)
+
+    def run():
+        for block in blocks:
+            session.callback(block, audio_device.CHUNK, None, 0)
+    return run
+
+
+def filtering_stage(data, settings, folder):
+    from .sweep import LevelMeasurement
+
+    measurement = LevelMeasurement({"channels": data.shape[1], "weighting": "A", "band": [50, 5000]}, settings)
+    windows = [data[start:start + audio_device.SAMPLE_RATE]
+               for start in range(0, len(data) - audio_device.SAMPLE_RATE + 1, audio_device.SAMPLE_RATE)]
+    out = np.zeros(len(measurement.fields))
+
+    def run():
+        for window in windows:
+            measurement(window, {}, out)
+    return run
+
+
+def tdoa_stage(data, settings, folder):
+    geometry = from_settings(settings)
+    windows = windows_of(data)
+
+    def run():
+        for window in windows:
+            get_lags(window, geometry.pairs, geometry.max_lags)
+    return run
+
+
+def angles_stage(data, settings, folder):
+    geometry = from_settings(settings)
+    lags = [get_lags(window, geometry.pairs, geometry.max_lags)[0] for window in windows_of(data)]
+
+    def run():
+        for window_lags in lags:
+            direction_to_angles(*geometry.direction(window_lags))
+    return run
+
+
+def metering_stage(data, settings, folder):
+    offset = spl.offsets(settings, data.shape[1])
+    blocks = [np.frombuffer(block, dtype=np.int32).reshape(-1, data.shape[1]) for block in blocks_of(data)]
+    meter = spl.SPLMeter(offset, data.shape[1], weighting="A", time_weighting="fast")
+
+    def run():
+        meter.reset()
+        for block in blocks:
+            spl.leq(block, offset)
+            meter(block)
+    return run
+
+
+def events_stage(data, settings, folder):
+    from .recorder import process_event
+
+    offset = spl.offsets(settings, data.shape[1])
+    frames = EVENT_SEC * audio_device.SAMPLE_RATE
+    events = [blocks_of(data[start:start + frames]) for start in range(0, len(data) - frames + 1, frames)]
+
+    def run():
+        for count, blocks in enumerate(events):
+            process_event(os.path.join(folder, f"event_{count}.wav"), blocks, {}, offset, channels=data.shape[1])
+    return run
+
+
+class BlockFeed:
+    """Stands in for the block queue of a Pipeline: hands out one block at a
+    time as if each arrived just after the previous one was processed, so
+    the worker runs in the timed thread without skipping windows or
+    waiting for them."""
+
+    def __init__(self, pipeline, blocks):
+        self.pipeline = pipeline
+        self.blocks = [(0.0, block) for block in blocks] + [None]
+        self.next = 0
+
+    def get(self):
+        if self.next % 256 == 0 and not self.pipeline.results.empty():
+            self.pipeline.drain()   # Keep the wake-up pipe from filling up
+        block = self.blocks[self.next]
+        self.next += 1
+        return block
+
+    def get_nowait(self):
+        raise queue.Empty
+
+
+def pipeline_stage(data, settings, folder):
+    from .pipeline import Pipeline
+
+    blocks = blocks_of(data)
+
+    def run():
+        pipeline = Pipeline(None, settings=settings)
+        pipeline.blocks = BlockFeed(pipeline, blocks)
+        pipeline.running.set()
+        pipeline.run()
+        os.close(pipeline.wake_r)
+        os.close(pipeline.wake_w)
+    return run
+
+
+STAGES = {"replay": replay_stage, "filtering": filtering_stage, "tdoa": tdoa_stage, "angles": angles_stage,
+          "metering": metering_stage, "events": events_stage, "pipeline": pipeline_stage}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(stage, data, settings, repeat=REPEAT):
+    """Time per second of audio, allocated MB and peak RSS MB of one stage.
+    The RSS is the peak of this process, see measure_isolated."""
+    folder = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        run = STAGES[stage](data, settings, folder)
+        run()   # Warm up: imports, FFT plans, filter designs
+        times = []
+        while len(times) < repeat or (sum(times) < MIN_TIMED_SEC and len(times) < MAX_REPEAT):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        run()
+        _, allocated = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    seconds = len(data) / audio_device.SAMPLE_RATE
+    return {"per_second": float(np.median(times)) / seconds, "allocated_mb": allocated / 1e6, "rss_mb": peak_rss_mb()}
+
+
+def measure_recording(stage, recording, settings, repeat):
+    data = load_input(recording) if recording else synthetic()
+    return measure(stage, data, settings, repeat)
+
+
+def measure_isolated(stage, recording, settings, repeat=REPEAT):
+    """measure() in a new process, started fresh instead of forked, for the
+    synthetic take (recording None) or a recording."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(measure_recording, stage, recording, settings, repeat).result()
+
+
+def machine():
+    """The hardware the timings belong to: the board model of a Raspberry Pi,
+    else the CPU model, never the host name."""
+    try:
+        with open("/proc/device-tree/model", 'r') as file:
+            return file.read().strip("\x00\n ")
+    except OSError:
+        pass
+    try:
+        with open("/proc/cpuinfo", 'r') as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return f"{platform.machine()} {line.split(':', 1)[1].strip()}"
+    except OSError:
+        pass
+    return f"{platform.machine()} {platform.processor()}".strip()
+
+
+def load_budgets(path=BUDGETS_FILE):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"machine": None, "budgets": {}}
+
+
+def run(recordings=(), stages=None, save=False, path=BUDGETS_FILE, repeat=REPEAT):
+    """Measure every stage on every input and compare with the budgets.
+    Returns 1 when a budget is exceeded."""
+    settings = config.load()
+    inputs = {"synthetic": None}
+    for recording in recordings:
+        inputs[os.path.basename(recording)] = recording
+    stages = stages or list(STAGES)
+
+    stored = load_budgets(path)
+    enforce = stored["machine"] in (None, machine())
+    if not enforce:
+        print(f"The budgets were measured on {stored['machine']}, this is {machine()}: not enforced.")
+    failed = False
+    results = {}
+    print(f"{'input':<20} {'stage':<10} {'ms per s':>9} {'alloc MB':>9} {'RSS MB':>8}  budget")
+    for name, recording in inputs.items():
+        results[name] = {}
+        for stage in stages:
+            result = measure_isolated(stage, recording, settings, repeat)
+            results[name][stage] = result
+            budget = stored["budgets"].get(name, {}).get(stage)
+            if budget is None:
+                verdict = "none"
+            else:
+                over = [key for key in result if result[key] > budget[key]]
+                failed = failed or (enforce and bool(over))
+                verdict = "pass" if not over else ("FAIL " if enforce else "over ") + ", ".join(over)
+            print(f"{name:<20} {stage:<10} {result['per_second'] * 1000:9.2f} {result['allocated_mb']:9.1f} "
+                  f"{result['rss_mb']:8.0f}  {verdict}")
+
+    if save:
+        budgets = stored["budgets"]
+        for name in results:
+            budgets.setdefault(name, {}).update(
+                {stage: {key: round(value * MARGIN, 6) for key, value in result.items()}
+                 for stage, result in results[name].items()})
+        with open(path, 'w') as file:
+            json.dump({"machine": machine(), "margin": MARGIN, "budgets": budgets}, file, indent=4)
+        print(f"Saved the budgets in {path}")
+        return 0
+    return 1 if failed else 0
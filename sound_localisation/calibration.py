@@ -0,0 +1,326 @@
+"""
+Compass calibration: a full turn of the QMC5883L around its Z axis is
+fitted with an ellipse, and the affine matrix from that ellipse to a
+circle is stored in variables.json for compass.py.
+
+During the acquiring phase, a curses interface gives feedback on how many
+points were acquired and at what turning angle, together with the error
+of the ellipse fitted so far. "R" starts over, "Q" finishes early.
+
+Every (x, y) sample is added to the 6x6 scatter matrix S = D^T D of the
+design matrix D = [x*x, x*y, y*y, x, y, 1], so memory stays constant no
+matter how many samples are taken and the fit can be redone at any time
+during the acquisition. The ellipse is the eigenvector of the generalized
+eigenproblem C a = l S a (Fitzgibbon), solved directly instead of forming
+inv(S) C.
+
+Web References:
+  * Fitting an Ellipse to a Set of Data Points
+    http://nicky.vanforeest.com/misc/fitEllipse/fitEllipse.html
+  * Circle affine transformation
+    https://math.stackexchange.com/questions/619037/circle-affine-transformation
+  * Fitting an ellipse to a set of data points in python (nan values in axes)
+    https://stackoverflow.com/questions/39693869/fitting-an-ellipse-to-a-set-of-data-points-in-python
+"""
+
+import curses
+import math
+import signal
+import sys
+import textwrap
+import time
+import numpy as np
+
+from . import config
+
+
+# ------------------------------------------------------------------------
+# Ellipse fit.
+# ------------------------------------------------------------------------
+# Raw values are divided by this before they are added, which keeps the
+# fourth powers in S well conditioned.
+SCALE = 32768.0
+
+# Constraint matrix 4ac - b^2 = 1.
+C = np.zeros([6, 6])
+C[0, 2] = C[2, 0] = 2; C[1, 1] = -1
+
+
+class EllipseFit:
+    """Least squares ellipse through samples added one at a time."""
+
+    def __init__(self):
+        self.S = np.zeros([6, 6])
+        self.count = 0
+
+    def add(self, x, y):
+        x /= SCALE
+        y /= SCALE
+        d = np.array([x*x, x*y, y*y, x, y, 1.0])
+        self.S += np.outer(d, d)
+        self.count += 1
+
+    def fit(self, use_abs=True):
+        """Return the conic coefficients of the best fit ellipse, in scaled units."""
+        from scipy.linalg import eig
+
+        E, V = eig(C, self.S)
+        E = np.where(np.isfinite(E), E, 0).real
+        if use_abs:
+            n = np.argmax(np.abs(E))
+        else:
+            # Use this if semi axes are invalid (sqrt of negative).
+            n = np.argmax(E)
+        return V[:, n].real
+
+    def quality(self, a=None):
+        """RMS fit error as a fraction of the ellipse radius, None if there
+        is no valid ellipse (yet)."""
+        if self.count < 6:
+            return None
+        if a is None:
+            a = self.fit()
+        # For a circle F(x, y) = (r^2 - R^2) / R^2 ~ 2 dr / R once F is
+        # scaled to -1 at the center.
+        center = ellipse_center(a)
+        at_center = a @ np.array([center[0]**2, center[0]*center[1], center[1]**2, center[0], center[1], 1.0])
+        if not np.isfinite(at_center) or at_center == 0:
+            return None
+        return 0.5 * np.sqrt(max(a @ self.S @ a, 0.0) / self.count) / abs(at_center)
+
+    def solve(self):
+        """Return the center, semi axes and rotation of the ellipse in raw
+        sensor units."""
+        ellipse = self.fit()
+        axes = ellipse_semi_axes_length(ellipse)
+        # If semi axes are invalid, try a different method.
+        if axes[0] is None or axes[1] is None:
+            ellipse = self.fit(use_abs=False)
+            axes = ellipse_semi_axes_length(ellipse)
+        center = ellipse_center(ellipse) * SCALE
+        return center, axes * SCALE, ellipse_angle_of_rotation(ellipse)
+
+    def calibration_matrix(self):
+        """Affine matrix from the fitted ellipse to a circle at the origin."""
+        (cx, cy), (a, b), phi = self.solve()
+        return affine_matrix(a, b, phi, cx, cy, to_origin=True)
+
+
+def ellipse_center(a):
+    """Return the coordinates of the ellipse center."""
+    b,c,d,f,g,a = a[1]/2, a[2], a[3]/2, a[4]/2, a[5], a[0]
+    num = b*b-a*c
+    x0=(c*d-b*f)/num
+    y0=(a*f-b*d)/num
+    return np.array([x0, y0])
+
+def ellipse_semi_axes_length(a):
+    """Return the lenght of both semi-axes of the ellipse."""
+    b,c,d,f,g,a = a[1]/2, a[2], a[3]/2, a[4]/2, a[5], a[0]
+    up = 2*(a*f*f+c*d*d+g*b*b-2*b*d*f-a*c*g)
+    down1=(b*b-a*c)*( (c-a)*np.sqrt(1+4*b*b/((a-c)*(a-c)))-(c+a))
+    down2=(b*b-a*c)*( (a-c)*np.sqrt(1+4*b*b/((a-c)*(a-c)))-(c+a))
+    if (up/down1) >= 0 and (up/down2) >= 0:
+        res1=np.sqrt(up/down1)
+        res2=np.sqrt(up/down2)
+    else:
+        res1 = None
+        res2 = None
+    return np.array([res1, res2])
+
+def ellipse_angle_of_rotation(a):
+    """Return the rotation angle (in radians) of the ellipse axes.
+    A positive angle means counter-clockwise rotation."""
+    b,c,d,f,g,a = a[1]/2, a[2], a[3]/2, a[4]/2, a[5], a[0]
+    return 0.5*np.arctan(2*b/(a-c))
+
+def affine_matrix(a, b, phi, cx, cy, to_origin=False):
+    """Matrix for affine transformation from ellipse to circle."""
+    if a >= b:
+        # Affine transformation to circle with R = A (major axis).
+        ab_ratio = float(a) / float(b)
+        cos_phi = np.cos(phi)
+        sin_phi = np.sin(phi)
+    else:
+        # Swap A and B axis: transformation to circle with R = B (major axis).
+        ab_ratio = float(b) / float(a)
+        cos_phi = np.cos(phi+np.pi/2)
+        sin_phi = np.sin(phi+np.pi/2)
+    # R1 and R2: matrix to rotate the ellipse orthogonal to the axes and back.
+    # T1 and T2: matrix to translate the ellipse to the origin and back.
+    # D: matrix to scale ellipse to circle.
+    R1 = np.array([[cos_phi,  sin_phi, 0], [-sin_phi, cos_phi, 0], [0, 0, 1]], dtype=float)
+    R2 = np.array([[cos_phi, -sin_phi, 0], [sin_phi,  cos_phi, 0], [0, 0, 1]], dtype=float)
+    T1 = np.array([[1,          0,   -cx], [0,        1,     -cy], [0, 0, 1]], dtype=float)
+    T2 = np.array([[1,          0,    cx], [0,        1,      cy], [0, 0, 1]], dtype=float)
+    D  = np.array([[1,          0,     0], [0, ab_ratio,       0], [0, 0, 1]], dtype=float)
+    if to_origin:
+        # Transformation shifted to axes origin.
+        return np.matmul(np.matmul(np.matmul(R2, D), R1), T1)
+    else:
+        # Transformation centered with the ellipse.
+        return np.matmul(np.matmul(np.matmul(np.matmul(T2, R2), D), R1), T1)
+
+
+def save_calibration(matrix, declination, path=None):
+    """Store the matrix in variables.json, keeping the other settings."""
+    config.save(path, **{'calibration matrix': matrix.tolist(), 'declination': declination})
+
+
+# ------------------------------------------------------------------------
+# Acquisition.
+# ------------------------------------------------------------------------
+# Subdivide the entire circle in sectors, to group samples.
+SECTORS_COUNT = 36
+# How many samples to get per each sector.
+SAMPLES_PER_SECTOR = 50
+# Sensor output data rate, samples are read as fast as they come.
+SAMPLE_INTERVAL = 0.02
+# Seconds between two live fits.
+FIT_INTERVAL = 1.0
+
+# Size of dial, in screen characters.
+DIAL_WIDTH = 37*2
+DIAL_HEIGHT = 19*2
+BORDER_X = 4
+BORDER_Y = 2
+
+# ------------------------------------------------------------------------
+# Calculate the size of screen objects.
+# ------------------------------------------------------------------------
+DIAL_RADIUS_X = float((DIAL_WIDTH - 1)/ 2.0)
+DIAL_RADIUS_Y = float((DIAL_HEIGHT -1) / 2.0)
+SECTOR_WIDTH = (2 * math.pi) / SECTORS_COUNT
+TOTAL_WIDTH = DIAL_WIDTH + BORDER_X * 2
+TOTAL_HEIGHT = DIAL_HEIGHT + BORDER_Y * 2
+
+# ------------------------------------------------------------------------
+# ------------------------------------------------------------------------
+def print_at(x, y, string, attr=curses.A_NORMAL):
+    global stdscr
+    try:
+        stdscr.addstr(y, x, string, attr)
+        stdscr.refresh()
+    except:
+        pass
+
+
+# ------------------------------------------------------------------------
+# ------------------------------------------------------------------------
+def terminate_handler(sig, frame):
+    curses.endwin()
+    sys.exit(1)
+
+# ------------------------------------------------------------------------
+# Draw the dial with every sector empty.
+# ------------------------------------------------------------------------
+def draw_dial():
+    stdscr.clear()
+    # Draw a box.
+    print_at(0, 0, "-" * TOTAL_WIDTH)
+    print_at(0, TOTAL_HEIGHT - 1, "-" * TOTAL_WIDTH)
+    for i in range(1, TOTAL_HEIGHT-1):
+        print_at(0, i, "|")
+        print_at(TOTAL_WIDTH-1, i, "|")
+    msg = 'Do a complete rotation of the sensor on the XY plane. When enough samples are acquired, each sector will be marked with an "#". Press "R" to restart, "Q" to finish early.'
+    print_at(0, TOTAL_HEIGHT+3, textwrap.fill(msg, TOTAL_WIDTH))
+
+    for i in range(0, SECTORS_COUNT):
+        angle = SECTOR_WIDTH * i
+        DOT_X = BORDER_X + int(DIAL_RADIUS_X + DIAL_RADIUS_X * math.sin(angle))
+        DOT_Y = BORDER_Y + int(DIAL_RADIUS_Y - DIAL_RADIUS_Y * math.cos(angle))
+        print_at(DOT_X, DOT_Y, ".")
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y + int(DIAL_RADIUS_Y), '+')
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y - 1, 'N')
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y + DIAL_HEIGHT, 'S')
+    print_at(BORDER_X + DIAL_WIDTH, BORDER_Y + int(DIAL_RADIUS_Y),  'E')
+    print_at(BORDER_X - 1, BORDER_Y + int(DIAL_RADIUS_Y), 'W')
+
+# ------------------------------------------------------------------------
+# Loop to acquire data for the entire circumference.
+# ------------------------------------------------------------------------
+def acquire(sensor):
+    """Return the EllipseFit of one full turn."""
+    fit = EllipseFit()
+    sampled = [0] * SECTORS_COUNT
+    completed_sectors = 0
+    last_fit = time.monotonic()
+    NEEDLE_X = NEEDLE_Y = 1
+    draw_dial()
+    while True:
+        (x, y, z) = sensor.get_magnet_raw()
+        if x is not None and y is not None:
+            # Angle on the XY plane from magnetic sensor.
+            angle = math.atan2(y, x)
+            if angle < 0:
+                angle += 2 * math.pi
+            sector = int(angle / SECTOR_WIDTH)
+            # Needle angle, rounded to sector center.
+            needle_angle = ((2 * math.pi) / SECTORS_COUNT) * sector
+            # Hide compass needle at previous position.
+            print_at(NEEDLE_X, NEEDLE_Y, " ")
+            # Print compass needle.
+            NEEDLE_X = BORDER_X + int(DIAL_RADIUS_X + DIAL_RADIUS_X * 0.8 * math.sin(needle_angle))
+            NEEDLE_Y = BORDER_Y + int(DIAL_RADIUS_Y - DIAL_RADIUS_Y * 0.8 * math.cos(needle_angle))
+            print_at(NEEDLE_X, NEEDLE_Y, "O", curses.A_REVERSE)
+            print_at(0, TOTAL_HEIGHT, "(X, Y) = (%s, %s), Compass: %s deg"
+                    % ("{:6d}".format(x), "{:6d}".format(y), "{:5.1f}".format(math.degrees(angle))))
+            if sampled[sector] < SAMPLES_PER_SECTOR:
+                DOT_X = BORDER_X + int(DIAL_RADIUS_X + DIAL_RADIUS_X * math.sin(needle_angle))
+                DOT_Y = BORDER_Y + int(DIAL_RADIUS_Y - DIAL_RADIUS_Y * math.cos(needle_angle))
+                fit.add(x, y)
+                sampled[sector] += 1
+                completed = int(10 * (float(sampled[sector]) / SAMPLES_PER_SECTOR))
+                if completed < 10:
+                    completed = str(completed)
+                    attr = curses.A_NORMAL
+                else:
+                    completed = '#'
+                    attr = curses.A_REVERSE
+                print_at(DOT_X, DOT_Y, completed, attr)
+                if sampled[sector] >= SAMPLES_PER_SECTOR:
+                    completed_sectors += 1
+                if completed_sectors >= SECTORS_COUNT:
+                    break
+        # Live fit quality, cheap because only the 6x6 matrix is solved.
+        if time.monotonic() - last_fit > FIT_INTERVAL:
+            last_fit = time.monotonic()
+            quality = fit.quality()
+            if quality is not None:
+                print_at(0, TOTAL_HEIGHT + 1, "Samples: %5d, fit error: %5.2f %% of radius  "
+                         % (fit.count, 100 * quality))
+        time.sleep(SAMPLE_INTERVAL)
+        key = stdscr.getch()
+        if key == ord('q'):
+            break
+        if key == ord('r'):
+            return acquire(sensor)
+    return fit
+
+
+def run(declination=None):
+    """Entry point of the calibrate command."""
+    global stdscr
+    import py_qmc5883l
+
+    if declination is None:
+        declination = config.load()["declination"]
+    # Initialize the magnetic sensor and screen curses.
+    sensor = py_qmc5883l.QMC5883L(output_data_rate=py_qmc5883l.ODR_50HZ)
+    signal.signal(signal.SIGINT, terminate_handler)
+    stdscr = curses.initscr()
+    # Hide the cursor and make getch() non-blocking.
+    curses.curs_set(0)
+    curses.noecho()
+    stdscr.nodelay(1)
+    stdscr.refresh()
+    try:
+        fit = acquire(sensor)
+    finally:
+        curses.endwin()
+
+    quality = fit.quality()
+    M1 = fit.calibration_matrix()
+    save_calibration(M1, declination)
+    print("Fitted %d samples, fit error %.2f %% of radius." % (fit.count, 100 * (quality or 0)))
+    print("Calibration matrix saved in variables.json: %s" % (M1.tolist(),))
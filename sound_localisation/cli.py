@@ -0,0 +1,301 @@
+"""
+Command line interface: `python -m sound_localisation <command>`.
+
+Only argparse and the standard library are imported up front. Every
+command imports its own module when it runs, so a restarted service
+doesn't pay for numpy, scipy or PortAudio it doesn't use.
+"""
+
+import argparse
+
+from . import profiler
+from . import stream
+
+
+def demo(args):
+    from . import demo
+
+    address, family = stream.parse_address(args)
+    demo.run(headless=args.headless, compass=args.compass, address=address, family=family, frame=args.frame)
+
+
+def record(args):
+    from .recorder import Recorder
+
+    Recorder(threshold_db=args.threshold, max_sample_sec=args.max_sample_sec, data_dir=args.data_dir,
+             pre_trigger_sec=args.pre_trigger, post_trigger_sec=args.post_trigger,
+             localise=not args.no_localise, workers=args.workers, compress=args.compress).run()
+
+
+def calibrate(args):
+    from . import calibration
+
+    calibration.run(declination=args.declination)
+
+
+def archive(args):
+    import datetime
+
+    from . import archive
+
+    if args.action == "run":
+        archive.run(args.folder, args.budget_gb, args.segment_sec)
+        return
+    if not (args.start and args.end and args.output):
+        raise SystemExit("export needs --start, --end and --output")
+    start = datetime.datetime.fromisoformat(args.start).timestamp()
+    end = datetime.datetime.fromisoformat(args.end).timestamp()
+    archive.export_wav(start, end, args.output, args.folder)
+
+
+def analyse(args):
+    from . import analyse
+
+    analyse.run(folder=args.data_dir, once=args.once, cache=args.cache, memo=not args.no_memo)
+
+
+def envelope(args):
+    from . import envelope
+
+    for path in args.recordings:
+        envelope.index_wav(path)
+        print(f"Saved {envelope.sidecar_path(path)}")
+
+
+def compress(args):
+    import os
+
+    from . import codec
+    from .analyse import read_wav
+
+    for path in args.recordings:
+        if path.endswith(codec.SUFFIX):
+            continue
+        data, rate = read_wav(path)
+        target = os.path.splitext(path)[0] + codec.SUFFIX
+        codec.save([data], target, data.shape[1], rate)
+        print(f"{path}: {os.path.getsize(target) / os.path.getsize(path):.0%} of the size in {target}")
+        if args.delete:
+            os.remove(path)
+
+
+def devices(args):
+    from . import devices
+
+    return devices.run(force=args.probe)
+
+
+def sweep(args):
+    from . import sweep
+
+    sweep.run(args.sweep, args.output)
+
+
+def windows(args):
+    from . import window_study
+
+    if args.action == "record":
+        window_study.record(args.folder, args.phi, args.theta)
+    else:
+        window_study.evaluate(args.folder, splits=args.splits, max_windows=args.max_windows)
+
+
+def capture_hub(args):
+    from . import hub
+
+    hub.run()
+
+
+def orientation(args):
+    from . import compass
+
+    compass.print_headings()
+
+
+def print_stream(args):
+    stream.print_stream(*stream.parse_address(args))
+
+
+def activity(args):
+    from . import activity
+
+    activity.run(*stream.parse_address(args), path=args.output)
+
+
+def rollup(args):
+    from . import rollup
+
+    if args.action == "run":
+        rollup.run(*stream.parse_address(args), folder=args.folder)
+    else:
+        rollup.show(args.resolution, args.days, folder=args.folder)
+
+
+def triangulate(args):
+    from . import triangulation
+
+    triangulation.run(args.config or triangulation.CONFIG_FILE, args.tolerance, args.simulate)
+
+
+def benchmark(args):
+    from . import benchmark
+
+    return benchmark.run(args.recordings, args.stages, args.save, args.budgets or benchmark.BUDGETS_FILE, args.repeat)
+
+
+def soak(args):
+    from . import soak
+
+    return soak.run(args.recording, args.services, args.hours, args.speed, args.snapshot_minutes, args.output)
+
+
+def profile(args):
+    try:
+        pid = profiler.resolve(args.target)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    print(f"Profiling {args.target} (process {pid}) for {args.duration:.0f} seconds...")
+    path = profiler.request(pid, args.duration)
+    if path is None:
+        raise SystemExit("No profile was written, is the process a sound_localisation command?")
+    print(f"Saved {path}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sound_localisation", description="TATA Steel sound localisation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("demo", help="Show the direction on a dial, or publish it with --headless")
+    command.add_argument("--headless", action="store_true",
+                         help="No dial, publish the estimates on a local socket instead")
+    command.add_argument("--compass", action="store_true",
+                         help="Read the QMC5883L in the background and add the compass heading")
+    command.add_argument("--frame", type=int,
+                         help="Update GCC-PHAT per frame of this many samples instead of recomputing the whole window")
+    stream.add_address_arguments(command)
+    command.set_defaults(func=demo)
+
+    command = commands.add_parser("record", help="Save every sound above the threshold")
+    command.add_argument("--threshold", type=float, default=100, help="Trigger level in dB")
+    command.add_argument("--max-sample-sec", type=float, default=5, help="Longest recording in seconds")
+    command.add_argument("--pre-trigger", type=float, default=0.5, help="Seconds kept from before the trigger")
+    command.add_argument("--post-trigger", type=float, default=0.5,
+                         help="Seconds recorded after the sound dropped below the threshold")
+    command.add_argument("--no-localise", action="store_true", help="Only save the events, don't localise them")
+    command.add_argument("--workers", type=int, default=1, help="Processes that save and localise the events")
+    command.add_argument("--compress", action="store_true", help="Save the events losslessly compressed, as .tsl files")
+    command.add_argument("--data-dir", help="Folder for the recordings, data_dir in variables.json by default")
+    command.set_defaults(func=record)
+
+    command = commands.add_parser("archive", help="Keep the full stream within a disk budget, or export a part of it")
+    command.add_argument("action", choices=["run", "export"])
+    command.add_argument("--budget-gb", type=float, default=8.0, help="Disk space of the archive")
+    command.add_argument("--segment-sec", type=float, default=60, help="Seconds per segment file")
+    command.add_argument("--start", help="Export from this local time, like 2025-06-01T12:00:00")
+    command.add_argument("--end", help="Export until this local time")
+    command.add_argument("--output", help="wav file to export to")
+    command.add_argument("--folder", help="Archive folder, archive in the data folder by default")
+    command.set_defaults(func=archive)
+
+    command = commands.add_parser("calibrate", help="Calibrate the compass with a full turn")
+    command.add_argument("--declination", type=float, help="Magnetic declination in degrees")
+    command.set_defaults(func=calibrate)
+
+    command = commands.add_parser("analyse", help="Localise new recordings in the data folder")
+    command.add_argument("--data-dir", help="Folder with the recordings, data_dir in variables.json by default")
+    command.add_argument("--once", action="store_true", help="Analyse the present recordings and stop")
+    command.add_argument("--cache", action="store_true",
+                         help="Localise from cached spectra, computed and stored the first time")
+    command.add_argument("--no-memo", action="store_true",
+                         help="Analyse every recording again, instead of reusing results of unchanged recordings")
+    command.set_defaults(func=analyse)
+
+    command = commands.add_parser("envelope", help="Write the min/max/RMS envelope of existing recordings")
+    command.add_argument("recordings", nargs="+", help="32 bit wav files")
+    command.set_defaults(func=envelope)
+
+    command = commands.add_parser("compress", help="Compress wav recordings losslessly to .tsl files")
+    command.add_argument("recordings", nargs="+", help="32 bit wav files")
+    command.add_argument("--delete", action="store_true", help="Delete the wav file after compressing it")
+    command.set_defaults(func=compress)
+
+    command = commands.add_parser("sweep", help="Run a measurement sweep described in a JSON file")
+    command.add_argument("sweep", help="Sweep file, see code/exp/phase 1 for examples")
+    command.add_argument("--output", required=True, help="Folder for the results, a sweep in it is resumed")
+    command.set_defaults(func=sweep)
+
+    command = commands.add_parser("windows", help="Record one take per tone and compare window lengths on them")
+    command.add_argument("action", choices=["record", "evaluate"])
+    command.add_argument("folder", help="Folder with the takes")
+    command.add_argument("--phi", type=float, default=45, help="Reference phi in degrees while recording")
+    command.add_argument("--theta", type=float, default=45, help="Reference theta in degrees while recording")
+    command.add_argument("--splits", type=int, nargs="+", help="Split every window in N parts, 1 by default")
+    command.add_argument("--max-windows", type=int, default=200, help="Windows evaluated per cell")
+    command.set_defaults(func=windows)
+
+    command = commands.add_parser("benchmark", help="Time every pipeline stage and compare with the stored budgets")
+    command.add_argument("recordings", nargs="*", help="Recordings to run besides the synthetic take")
+    command.add_argument("--stages", nargs="+", choices=["replay", "filtering", "tdoa", "angles", "metering", "events",
+                                                         "pipeline"], help="Stages to run, all by default")
+    command.add_argument("--repeat", type=int, default=5,
+                         help="Timed runs per stage at least, the median counts")
+    command.add_argument("--save", action="store_true", help="Store the results as the new budgets")
+    command.add_argument("--budgets", help="Budgets file, benchmark.json in the package by default")
+    command.set_defaults(func=benchmark)
+
+    command = commands.add_parser("soak", help="Replay days of audio into the recorder and demo and look for leaks")
+    command.add_argument("recording", nargs="?", help="Recording to replay, a synthetic take by default")
+    command.add_argument("--services", nargs="+", choices=["record", "demo"], help="Services to run, both by default")
+    command.add_argument("--hours", type=float, default=168, help="Hours of audio to replay")
+    command.add_argument("--speed", type=float, default=0,
+                         help="Times real time, 0 (the default) is as fast as the services keep up")
+    command.add_argument("--snapshot-minutes", type=float, default=60, help="Minutes of audio between snapshots")
+    command.add_argument("--output", default="soak", help="Folder for soak.csv")
+    command.set_defaults(func=soak)
+
+    command = commands.add_parser("profile", help="Profile a running command, like the demo or record")
+    command.add_argument("target", help="Command to profile, like demo, or its process id")
+    command.add_argument("--duration", type=float, default=30, help="Seconds to profile")
+    command.set_defaults(func=profile)
+
+    command = commands.add_parser("devices", help="List audio devices, probe the i2smaster device and store its configuration")
+    command.add_argument("--probe", action="store_true", help="Probe again even if the device was probed before")
+    command.set_defaults(func=devices)
+
+    command = commands.add_parser("hub", help="Own the audio device and share it with the other commands")
+    command.set_defaults(func=capture_hub)
+
+    command = commands.add_parser("orientation", help="Print the compass heading")
+    command.set_defaults(func=orientation)
+
+    command = commands.add_parser("stream", help="Print the estimate stream as JSON lines")
+    stream.add_address_arguments(command)
+    command.set_defaults(func=print_stream)
+
+    command = commands.add_parser("activity", help="Keep a decaying map of where the noise comes from")
+    command.add_argument("--output", help="Snapshot file, activity.npz in the data folder by default")
+    stream.add_address_arguments(command)
+    command.set_defaults(func=activity)
+
+    command = commands.add_parser("rollup", help="Keep per minute, hour and day summaries of the estimate stream")
+    command.add_argument("action", choices=["run", "show"])
+    command.add_argument("--resolution", choices=["minute", "hour", "day"], default="hour",
+                         help="Summaries to show")
+    command.add_argument("--days", type=float, default=1, help="Days to show")
+    command.add_argument("--folder", help="Folder of the rollup files, rollups in the data folder by default")
+    stream.add_address_arguments(command)
+    command.set_defaults(func=rollup)
+
+    command = commands.add_parser("triangulate", help="Combine the estimates of several arrays into positions")
+    command.add_argument("--config", help="JSON file with the node positions and addresses")
+    command.add_argument("--tolerance", type=float, help="Seconds between estimates to match them")
+    command.add_argument("--simulate", action="store_true", help="Start simulated nodes on the configured addresses")
+    command.set_defaults(func=triangulate)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler.install(args.command)
+    return args.func(args) or 0
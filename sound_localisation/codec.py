@@ -0,0 +1,209 @@
+"""
+Lossless compression of the 32 bit recordings (.tsl files).
+
+The i2smaster slots carry 24 bit samples left-aligned in 32 bit words and
+plant noise is predictable, so every block of BLOCK_FRAMES frames is
+stored per channel as:
+
+    shift   low bits that are zero in every sample (8 for 24 bit audio), dropped
+    order   fixed polynomial predictor (0-3, like FLAC) with the smallest residuals
+    k       Rice parameter of the residuals
+
+The residuals are Rice coded, with the unary quotients and the k bit
+remainders in two separate bit streams, so both encoding and decoding are
+whole-array numpy operations. A footer lists where every block starts, so
+a time range is read without decoding the blocks before it.
+
+File layout (little endian):
+    header: magic b"TSLC", version (u8), channels (u8), sample rate (u32), block frames (u32)
+    block:  frames (u32), per channel: shift (u8), order (u8), k (u8), unary bytes (u32),
+            unary stream, remainder stream (ceil(frames * k / 8) bytes)
+    footer: block offsets (u64 each), total frames (u64), block count (u32), magic b"TSLI"
+
+CodecWriter encodes on a background thread, so it can be fed from a
+recording loop.
+"""
+
+import queue
+import struct
+import threading
+import numpy as np
+
+from . import audio as audio_device
+
+
+BLOCK_FRAMES = 4096
+MAX_ORDER = 3
+VERSION = 1
+SUFFIX = ".tsl"
+
+HEADER = struct.Struct("<4sBBII")
+BLOCK = struct.Struct("<I")
+CHANNEL = struct.Struct("<BBBI")
+FOOTER = struct.Struct("<QI4s")
+
+
+def residuals(samples, order):
+    """Prediction errors of the fixed predictor of order, the samples before
+    the start count as 0."""
+    padded = np.concatenate((np.zeros(order, dtype=np.int64), samples))
+    return np.diff(padded, n=order) if order else padded
+
+
+def reconstruct(errors, order):
+    samples = errors
+    for _ in range(order):
+        samples = np.cumsum(samples)
+    return samples
+
+
+def encode_channel(samples):
+    """Encode one channel of a block, return the bytes."""
+    samples = samples.astype(np.int64)
+    combined = int(np.bitwise_or.reduce(samples & 0xFFFFFFFF)) if len(samples) else 0
+    shift = (combined & -combined).bit_length() - 1 if combined else 0
+    samples = samples >> shift
+
+    best = None
+    for order in range(MAX_ORDER + 1):
+        errors = residuals(samples, order)
+        cost = np.abs(errors).sum()
+        if best is None or cost < best[0]:
+            best = (cost, order, errors)
+    _, order, errors = best
+
+    # Zigzag: 0, -1, 1, -2, ... -> 0, 1, 2, 3, ...
+    values = ((errors << 1) ^ (errors >> 63)).astype(np.uint64)
+    mean = float(values.mean()) if len(values) else 0.0
+    estimate = max(0, int(np.log2(mean)) if mean >= 1 else 0)
+    k = min((max(0, estimate - 1), estimate, estimate + 1),
+            key=lambda k: int((values >> np.uint64(k)).sum()) + len(values) * (k + 1))
+
+    quotients = (values >> np.uint64(k)).astype(np.int64)
+    # Unary: quotient ones, then a zero.
+    ends = np.cumsum(quotients + 1)
+    unary = np.ones(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    unary[ends - 1] = 0
+    unary = np.packbits(unary).tobytes()
+    remainder = b""
+    if k:
+        shifts = np.arange(k - 1, -1, -1, dtype=np.uint64)
+        bits = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+        remainder = np.packbits(bits.ravel()).tobytes()
+    return CHANNEL.pack(shift, order, k, len(unary)) + unary + remainder
+
+
+def decode_channel(data, offset, frames):
+    """Decode one channel of a block, return the samples and the offset after it."""
+    shift, order, k, unary_bytes = CHANNEL.unpack_from(data, offset)
+    offset += CHANNEL.size
+    unary = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=unary_bytes, offset=offset))
+    offset += unary_bytes
+    ends = np.flatnonzero(unary == 0)[:frames]
+    quotients = np.diff(ends, prepend=-1) - 1
+    values = quotients.astype(np.uint64) << np.uint64(k)
+    if k:
+        remainder_bytes = (frames * k + 7) // 8
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=remainder_bytes, offset=offset))
+        offset += remainder_bytes
+        bits = bits[:frames * k].reshape(frames, k).astype(np.uint64)
+        values |= (bits << np.arange(k - 1, -1, -1, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+    errors = (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+    return reconstruct(errors, order) << shift, offset
+
+
+def encode_block(block):
+    """Encode (frames, channels) int32 samples."""
+    return BLOCK.pack(len(block)) + b"".join(encode_channel(block[:, ch]) for ch in range(block.shape[1]))
+
+
+def decode_block(data, channels, offset=0):
+    frames, = BLOCK.unpack_from(data, offset)
+    offset += BLOCK.size
+    block = np.empty((frames, channels), dtype=np.int32)
+    for ch in range(channels):
+        samples, offset = decode_channel(data, offset, frames)
+        block[:, ch] = samples.astype(np.uint32).view(np.int32)
+    return block, offset
+
+
+class CodecWriter:
+    """Writes a .tsl file from blocks of any size, encoding on a background thread."""
+
+    def __init__(self, path, channels=audio_device.CHANNELS, rate=audio_device.SAMPLE_RATE,
+                 block_frames=BLOCK_FRAMES):
+        self.file = open(path, "wb")
+        self.channels = channels
+        self.block_frames = block_frames
+        self.file.write(HEADER.pack(b"TSLC", VERSION, channels, rate, block_frames))
+        self.offsets = []
+        self.frames = 0
+        self.pending = []
+        self.pending_frames = 0
+        self.blocks = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        """Queue int32 samples, as bytes or a (frames, channels) array."""
+        self.blocks.put(np.frombuffer(data, dtype=np.int32).reshape(-1, self.channels)
+                        if isinstance(data, (bytes, bytearray)) else np.asarray(data, dtype=np.int32))
+
+    def run(self):
+        while True:
+            data = self.blocks.get()
+            if data is not None:
+                self.pending.append(data)
+                self.pending_frames += len(data)
+            if self.pending_frames >= self.block_frames or (data is None and self.pending_frames):
+                samples = np.concatenate(self.pending)
+                full = len(samples) if data is None else len(samples) // self.block_frames * self.block_frames
+                for start in range(0, full, self.block_frames):
+                    self.offsets.append(self.file.tell())
+                    self.file.write(encode_block(samples[start:start + self.block_frames]))
+                self.frames += full
+                self.pending = [samples[full:]]
+                self.pending_frames = len(samples) - full
+            if data is None:
+                return
+
+    def close(self):
+        self.blocks.put(None)
+        self.thread.join()
+        self.file.write(np.array(self.offsets, dtype="<u8").tobytes())
+        self.file.write(FOOTER.pack(self.frames, len(self.offsets), b"TSLI"))
+        self.file.close()
+
+
+class CodecReader:
+    """Random access to the frames of a .tsl file. The file is memory mapped,
+    only the header, the index and the blocks that are read are loaded."""
+
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, self.channels, self.rate, self.block_frames = HEADER.unpack_from(self.data)
+        if magic != b"TSLC" or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} .tsl file")
+        self.frames, count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if magic != b"TSLI":
+            raise ValueError(f"{path} wasn't closed, its index is missing")
+        self.offsets = np.frombuffer(self.data, dtype="<u8", count=count,
+                                     offset=len(self.data) - FOOTER.size - 8 * count)
+
+    def read(self, start=0, end=None):
+        """Return frames start to end as an int32 (frames, channels) array."""
+        end = self.frames if end is None else min(end, self.frames)
+        first, last = start // self.block_frames, -(-end // self.block_frames)
+        blocks = [decode_block(self.data, self.channels, int(self.offsets[i]))[0] for i in range(first, last)]
+        if not blocks:
+            return np.zeros((0, self.channels), dtype=np.int32)
+        data = np.concatenate(blocks)
+        return data[start - first * self.block_frames:end - first * self.block_frames]
+
+
+def save(blocks, path, channels=audio_device.CHANNELS, rate=audio_device.SAMPLE_RATE):
+    """Write a list of int32 byte blocks to a .tsl file, like recorder.save_buffer."""
+    writer = CodecWriter(path, channels, rate)
+    for block in blocks:
+        writer.write(block)
+    writer.close()
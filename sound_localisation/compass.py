@@ -0,0 +1,140 @@
+"""
+Background reader for the QMC5883L compass.
+
+A daemon thread reads the sensor at its output data rate, applies the
+calibration matrix from variables.json (written by the calibrate
+command) and low-pass filters the heading. The audio
+code only reads the last filtered heading, so there is no I2C traffic in
+the audio path.
+
+An I2C error (a loose wire, the sensor resetting) doesn't stop the
+thread: it waits, twice as long after every failed read up to
+MAX_BACKOFF, and tries again. Meanwhile heading keeps the last value, so
+users check stale (no good sample for STALE_SECONDS) before they turn
+directions into bearings from north.
+"""
+
+import math
+import threading
+import time
+
+from . import config
+
+
+# === Compass Configuration ===
+OUTPUT_DATA_RATE = 50       # Hz, one of 10, 50, 100 or 200
+TIME_CONSTANT = 1.0         # Seconds, low-pass filter on the heading
+STALE_SECONDS = 1.0         # Without a good sample this long the heading isn't trusted
+MAX_BACKOFF = 5.0           # Seconds, longest wait between reads after I2C errors
+
+
+class Compass:
+    """Filtered compass heading, updated by a background thread.
+
+    heading is the bearing of the sensor x axis in degrees clockwise from
+    true north, or None until the first sample is read. last_update is the
+    time.monotonic() of the last good sample.
+    """
+
+    def __init__(self, output_data_rate=OUTPUT_DATA_RATE, time_constant=TIME_CONSTANT, settings=None):
+        settings = settings or config.load()
+        self.output_data_rate = output_data_rate
+        self.alpha = 1 - math.exp(-1 / (output_data_rate * time_constant))
+        self.calibration = settings["calibration matrix"]
+        self.declination = settings["declination"]
+        self.heading = None
+        self.last_update = None
+        self.errors = 0             # I2C errors since the last good sample
+        self.running = threading.Event()
+        self.thread = None
+
+    def start(self):
+        import py_qmc5883l
+
+        rates = {10: py_qmc5883l.ODR_10HZ, 50: py_qmc5883l.ODR_50HZ,
+                 100: py_qmc5883l.ODR_100HZ, 200: py_qmc5883l.ODR_200HZ}
+        sensor = py_qmc5883l.QMC5883L(output_data_rate=rates[self.output_data_rate])
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, args=(sensor,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+
+    @property
+    def age(self):
+        """Seconds since the last good sample, inf before the first."""
+        if self.last_update is None:
+            return math.inf
+        return time.monotonic() - self.last_update
+
+    @property
+    def stale(self):
+        return self.age > STALE_SECONDS
+
+    def current(self):
+        """The heading, or nan when there is none or it is stale."""
+        heading = self.heading
+        if heading is None or self.stale:
+            return math.nan
+        return heading
+
+    def run(self, sensor):
+        c = self.calibration
+        period = 1 / self.output_data_rate
+        # Filter the unit vector instead of the angle so 359 -> 0 doesn't jump.
+        east = north = None
+        next_read = time.monotonic()
+        while self.running.is_set():
+            try:
+                x, y, _ = sensor.get_magnet_raw()
+            except OSError as error:
+                if self.errors == 0:
+                    print(f"Reading the compass failed: {error}, retrying")
+                self.errors += 1
+                time.sleep(min(period * 2 ** self.errors, MAX_BACKOFF))
+                next_read = time.monotonic()
+                continue
+            if x is not None and y is not None:
+                x1 = x * c[0][0] + y * c[0][1] + c[0][2]
+                y1 = x * c[1][0] + y * c[1][1] + c[1][2]
+                norm = math.hypot(x1, y1)
+                if norm > 0:
+                    if east is None:
+                        east, north = y1 / norm, x1 / norm
+                    else:
+                        east += self.alpha * (y1 / norm - east)
+                        north += self.alpha * (x1 / norm - north)
+                    bearing = math.degrees(math.atan2(east, north)) + self.declination
+                    self.heading = bearing % 360
+                    self.last_update = time.monotonic()
+                    self.errors = 0
+            next_read += period
+            time.sleep(max(0.0, next_read - time.monotonic()))
+        try:
+            sensor.mode_standby()
+        except OSError:
+            pass
+
+
+def world_bearing(heading, phi):
+    """Bearing in degrees from true north of an array azimuth phi (radians,
+    from the array x axis towards y), for a compass with its x axis
+    mounted along the array x axis."""
+    return (heading - math.degrees(phi)) % 360
+
+
+def print_headings(interval=0.5):
+    """Print the filtered heading every interval seconds until interrupted."""
+    compass = Compass()
+    compass.start()
+    try:
+        while True:
+            print(compass.heading if not compass.stale else f"{compass.heading} (stale, {compass.age:.1f} s old)")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        compass.stop()
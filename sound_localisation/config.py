@@ -0,0 +1,56 @@
+"""
+Settings shared by all commands, stored in variables.json.
+
+The file lives next to this module unless the environment variable
+SOUND_LOCALISATION_VARIABLES points somewhere else. Missing keys fall
+back to DEFAULTS, and save() merges into the file so commands don't
+overwrite each other's settings.
+"""
+
+import json
+import os
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIABLES_FILE = os.environ.get("SOUND_LOCALISATION_VARIABLES", os.path.join(PACKAGE_DIR, "variables.json"))
+
+DEFAULTS = {
+    "dev_index": 0,             # PyAudio index of the i2smaster device, see devices.py
+    "offset": 120.0,            # dB SPL at digital full scale, or a list with one per channel, measure it with code/exp/phase 1/decibel_offset.json
+    "declination": 2.4,         # Degrees, magnetic declination
+    "calibration matrix": [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+    "data_dir": "~/stereo-env/data",
+    "frame": 0,                 # GCC-PHAT frame length of the demo, 0 recomputes the whole window every hop
+    "geometry": None,           # {"positions": [[x, y, z] in m per channel]}, None is the layout of geometry.py
+    "min_window": 1200,         # Shortest analysis window of the demo in frames, 0 always uses the whole window
+}
+
+
+def load(path=None):
+    """Return the settings with the defaults filled in."""
+    data = dict(DEFAULTS)
+    try:
+        with open(path or VARIABLES_FILE, 'r') as file:
+            data.update(json.load(file))
+    except FileNotFoundError:
+        pass
+    return data
+
+
+def save(path=None, **values):
+    """Update the given keys in variables.json, keeping the others."""
+    path = path or VARIABLES_FILE
+    try:
+        with open(path, 'r') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        data = {}
+    data.update(values)
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+
+def data_dir(settings=None):
+    """Folder where the recordings are stored."""
+    settings = settings or load()
+    return os.path.expanduser(settings["data_dir"])
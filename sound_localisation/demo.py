@@ -0,0 +1,184 @@
+"""
+Curses dial showing the direction of the loudest sound source, or with
+--headless the same estimates published on a local socket (see stream.py).
+"""
+
+import curses
+import math
+import select
+import socket
+import sys
+import textwrap
+
+from . import audio as audio_device
+from . import compass as compass_sensor
+from . import stream
+from .pipeline import Pipeline
+
+
+SECTORS_COUNT = 72
+DIAL_WIDTH = int(37*1.5)
+DIAL_HEIGHT = int(19*1.5)
+BORDER_X = 4
+BORDER_Y = 2
+
+DIAL_RADIUS_X = float((DIAL_WIDTH - 1)/ 2.0)
+DIAL_RADIUS_Y = float((DIAL_HEIGHT -1) / 2.0)
+SECTOR_WIDTH = (2 * math.pi) / SECTORS_COUNT
+TOTAL_WIDTH = DIAL_WIDTH + BORDER_X * 2
+TOTAL_HEIGHT = DIAL_HEIGHT + BORDER_Y * 2
+
+NEEDLE_X, NEEDLE_Y = 0, 0  # Initial dummy values
+
+
+def print_at(x, y, string, attr=curses.A_NORMAL):
+    try:
+        stdscr.addstr(y, x, string, attr)
+        stdscr.refresh()
+    except curses.error:
+        pass  # Safe to ignore small drawing errors
+
+
+def terminate_handler(sig, frame):
+    curses.endwin()
+    sys.exit(1)
+
+
+def draw_estimate(phi, theta):
+    """Draw the needle for an estimate, phi and theta in radians."""
+    global NEEDLE_X, NEEDLE_Y
+
+    phi_deg = math.degrees(phi)
+    theta = math.degrees(theta)
+    if theta <20:
+        theta_l = 20/120
+    elif theta > 120:
+        theta_l = 1
+    else:
+        theta_l = theta/120
+    if phi < 0:
+        phi += 2 * math.pi
+    sector = int(phi / SECTOR_WIDTH)
+    needle_angle = ((2 * math.pi) / SECTORS_COUNT) * sector
+
+    # Hide old needle
+    print_at(NEEDLE_X, NEEDLE_Y, " ")
+
+
+    # Draw new needle
+    NEEDLE_X = BORDER_X + int(DIAL_RADIUS_X + DIAL_RADIUS_X * 0.8 * math.sin(needle_angle) * theta_l)
+    NEEDLE_Y = BORDER_Y + int(DIAL_RADIUS_Y - DIAL_RADIUS_Y * 0.8 * math.cos(needle_angle) * theta_l)
+    print_at(int(NEEDLE_X), NEEDLE_Y, f"{int(phi_deg)}", curses.A_REVERSE)
+
+    # Show phi angle in degrees
+    DOT_X = BORDER_X + int(DIAL_RADIUS_X + DIAL_RADIUS_X * math.sin(needle_angle) * theta_l)
+    DOT_Y = BORDER_Y + int(DIAL_RADIUS_Y - DIAL_RADIUS_Y * math.cos(needle_angle) * theta_l)
+    print_at(DOT_X,int( DOT_Y), f"{int(theta)}", curses.A_DIM)
+
+
+def draw_bearing(phi, heading, compass=None):
+    """Show the compass corrected bearing below the dial, or that the compass
+    has no recent reading."""
+    if math.isnan(heading):
+        if compass is not None:
+            print_at(0, TOTAL_HEIGHT, "Bearing from north: no compass reading")
+        return
+    bearing = compass_sensor.world_bearing(heading, phi)
+    print_at(0, TOTAL_HEIGHT, f"Bearing from north: {bearing:5.1f} deg           ")
+
+
+def main(stdscr_ref, compass=None, frame=None):
+    global stdscr
+    stdscr = stdscr_ref
+
+    # Setup curses
+    curses.curs_set(0)
+    curses.noecho()
+    stdscr.nodelay(1)
+    stdscr.clear()
+
+    # Draw static UI
+    print_at(0, 0, "-" * TOTAL_WIDTH)
+    print_at(0, TOTAL_HEIGHT - 1, "-" * TOTAL_WIDTH)
+    for i in range(1, TOTAL_HEIGHT - 1):
+        print_at(0, i, "|")
+        print_at(TOTAL_WIDTH - 1, i, "|")
+    msg = r'This is a demonstration of the TATA Steel Sound Localisation System. It accurately determines the direction of sound sources louder than 60 dB, with a precision of ±5°. The black value is theta and the white value is phi.  Press "q" to quit.'
+    print_at(0, TOTAL_HEIGHT + 2, textwrap.fill(msg, TOTAL_WIDTH))
+
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y + int(DIAL_RADIUS_Y), '+')
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y - 1, 'x')
+    print_at(BORDER_X + int(DIAL_RADIUS_X), BORDER_Y + DIAL_HEIGHT, '-x')
+    print_at(BORDER_X + DIAL_WIDTH, BORDER_Y + int(DIAL_RADIUS_Y), 'y')
+    print_at(BORDER_X - 1, BORDER_Y + int(DIAL_RADIUS_Y), '-y')
+
+    audio = audio_device.open_audio()
+    pipeline = Pipeline(audio, compass=compass, frame=frame)
+    pipeline.start()
+
+    try:
+        running = True
+        while running:
+            # Sleep until either a key is pressed or a new estimate is ready.
+            ready, _, _ = select.select([sys.stdin, pipeline.wake_r], [], [])
+
+            if pipeline.wake_r in ready:
+                results = pipeline.drain()
+                if results:
+                    latest = results[-1]
+                    draw_estimate(latest[1], latest[2])
+                    draw_bearing(latest[1], latest[5], compass)
+
+            if sys.stdin in ready:
+                # Check for quit key
+                key = stdscr.getch()
+                while key != -1:
+                    if key == ord('q'):
+                        running = False
+                    key = stdscr.getch()
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        curses.endwin()
+        audio.terminate()
+
+
+def headless_run(address, family, compass=None, frame=None):
+    """Run the pipeline without UI and publish every estimate."""
+    audio = audio_device.open_audio()
+    pipeline = Pipeline(audio, compass=compass, frame=frame)
+    publisher = stream.EstimatePublisher(address, family)
+    publisher.start()
+    pipeline.start()
+
+    try:
+        while True:
+            select.select([pipeline.wake_r], [], [])
+            for timestamp, phi, theta, confidence, spl, heading in pipeline.drain():
+                publisher.publish(timestamp, phi, theta, confidence, spl, heading)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        publisher.stop()
+        audio.terminate()
+
+
+def run(headless=False, compass=False, address=(stream.DEFAULT_HOST, stream.DEFAULT_PORT), family=socket.AF_INET,
+        frame=None):
+    """Entry point of the demo command."""
+    sensor = None
+    if compass:
+        sensor = compass_sensor.Compass()
+        sensor.start()
+
+    try:
+        if headless:
+            headless_run(address, family, compass=sensor, frame=frame)
+        else:
+            curses.wrapper(main, sensor, frame)
+    finally:
+        if sensor is not None:
+            sensor.stop()
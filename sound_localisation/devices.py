@@ -0,0 +1,162 @@
+"""
+Lists the PortAudio devices, finds the i2smaster device and probes which
+configuration works best on it.
+
+The probe asks PortAudio which sample rates, channel counts and sample
+formats the device accepts, then streams a few seconds for every
+frames_per_buffer in FRAMES_PER_BUFFER while timing the callbacks. The
+smallest buffer without overflows and with a callback jitter below
+MAX_JITTER wins. The result is stored in variables.json together with a
+fingerprint of the device (see audio.configured_device), so later starts
+reuse it without probing again.
+"""
+
+import time
+
+from . import audio as audio_device
+from . import config
+
+
+DEVICE_NAME = "i2smaster"
+
+# === Probe Configuration ===
+RATES = [16000, 44100, 48000, 96000]
+CHANNEL_COUNTS = [1, 2, 4, 8]
+FORMATS = ["paInt16", "paInt24", "paInt32", "paFloat32"]
+FRAMES_PER_BUFFER = [128, 256, 480, 1024, 2048, 4800]
+PROBE_SECONDS = 3.0         # Seconds streamed per frames_per_buffer
+MAX_JITTER = 0.25           # 99th percentile callback interval error, as a fraction of the buffer period
+
+
+def find_device(audio):
+    """Print every device and return the info of the i2smaster device, or None."""
+    found = None
+    for i in range(0, audio.get_device_count()):
+        info = audio.get_device_info_by_index(i)
+        print(info)
+        if DEVICE_NAME in info['name']:
+            found = info
+    return found
+
+
+def supported_formats(audio, info):
+    """Return the (rate, channels, format name) combinations the device accepts."""
+    import pyaudio
+
+    supported = []
+    for rate in RATES:
+        for channels in CHANNEL_COUNTS:
+            if channels > info['maxInputChannels']:
+                continue
+            for name in FORMATS:
+                try:
+                    audio.is_format_supported(rate, input_device=info['index'], input_channels=channels,
+                                              input_format=getattr(pyaudio, name))
+                except ValueError:
+                    continue
+                supported.append((rate, channels, name))
+    return supported
+
+
+def measure(audio, dev_index, frames_per_buffer, seconds=PROBE_SECONDS):
+    """Stream with frames_per_buffer and return the overflow rate and the
+    callback jitter."""
+    import pyaudio
+
+    times = []
+    overflows = 0
+
+    def callback(in_data, frame_count, time_info, status):
+        nonlocal overflows
+        times.append(time.perf_counter())
+        if status & pyaudio.paInputOverflow:
+            overflows += 1
+        return (None, pyaudio.paContinue)
+
+    try:
+        stream = audio_device.open_input(audio, callback, frames_per_buffer=frames_per_buffer, dev_index=dev_index)
+    except (OSError, ValueError) as error:
+        return {"frames_per_buffer": frames_per_buffer, "error": str(error)}
+    stream.start_stream()
+    time.sleep(seconds)
+    stream.stop_stream()
+    stream.close()
+
+    # The first callbacks come in a burst while the stream starts up.
+    period = frames_per_buffer / audio_device.SAMPLE_RATE
+    intervals = [b - a for a, b in zip(times[2:], times[3:])]
+    if not intervals:
+        return {"frames_per_buffer": frames_per_buffer, "error": "no callbacks"}
+    errors = sorted(abs(interval - period) for interval in intervals)
+    return {"frames_per_buffer": frames_per_buffer,
+            "callbacks": len(times),
+            "overflow_rate": overflows / len(times),
+            "jitter": errors[int(0.99 * (len(errors) - 1))] / period}
+
+
+def best_configuration(measurements):
+    """Smallest working buffer, or the largest one that opened at all."""
+    working = [m for m in measurements if "error" not in m]
+    for m in sorted(working, key=lambda m: m["frames_per_buffer"]):
+        if m["overflow_rate"] == 0 and m["jitter"] <= MAX_JITTER:
+            return m
+    if working:
+        return max(working, key=lambda m: m["frames_per_buffer"])
+    return None
+
+
+def probe(audio, info):
+    """Return the configuration to store for the device, or None when the
+    device can't stream the format the other commands read."""
+    supported = supported_formats(audio, info)
+    for rate, channels, name in supported:
+        print(f"supported: {rate} Hz, {channels} channels, {name}")
+    if (audio_device.SAMPLE_RATE, audio_device.CHANNELS, "paInt32") not in supported:
+        print(f"{info['name']} doesn't accept {audio_device.SAMPLE_RATE} Hz, {audio_device.CHANNELS} channels, paInt32.")
+        return None
+
+    measurements = []
+    for frames_per_buffer in FRAMES_PER_BUFFER:
+        m = measure(audio, info['index'], frames_per_buffer)
+        measurements.append(m)
+        if "error" in m:
+            print(f"frames_per_buffer {frames_per_buffer}: {m['error']}")
+        else:
+            print(f"frames_per_buffer {frames_per_buffer}: overflow rate {m['overflow_rate']:.3f}, "
+                  f"jitter {100 * m['jitter']:.0f} % of the period")
+
+    best = best_configuration(measurements)
+    if best is None:
+        return None
+    return {"fingerprint": audio_device.device_fingerprint(info),
+            "name": info['name'],
+            "frames_per_buffer": best["frames_per_buffer"],
+            "measurements": measurements}
+
+
+def run(force=False):
+    audio = audio_device.open_audio()
+    try:
+        info = find_device(audio)
+        if info is None:
+            print(f"No {DEVICE_NAME} device found, variables.json is not changed.")
+            return 1
+
+        settings = config.load()
+        probed = settings.get("device")
+        if probed and not force and probed["fingerprint"] == audio_device.device_fingerprint(info):
+            print(f"Using the probed configuration, frames_per_buffer {probed['frames_per_buffer']}. "
+                  "Use --probe to measure again.")
+            config.save(dev_index=info['index'])
+            return 0
+
+        device = probe(audio, info)
+    finally:
+        audio.terminate()
+
+    if device is None:
+        config.save(dev_index=info['index'])
+        return 1
+    config.save(dev_index=info['index'], device=device)
+    print({'dev_index': info['index'], 'frames_per_buffer': device["frames_per_buffer"]})
+    return 0
@@ -0,0 +1,150 @@
+"""
+Min/max/RMS envelopes of recordings at several zoom levels.
+
+Next to every recording a small sidecar (<recording>.env.npz) holds, per
+level in LEVELS, the minimum, maximum and RMS of every bin of that many
+frames per channel, as fractions of full scale. A level plot of an hour
+only reads the 1 s level (a few hundred kB) instead of the audio.
+
+EnvelopeWriter is fed block by block while a recording is written; only
+the finest level is computed from the samples, every coarser level from
+the bins of the level below it.
+"""
+
+import wave
+import numpy as np
+
+from . import audio as audio_device
+
+
+LEVELS = [480, 4800, 48000]     # Frames per bin: 10 ms, 100 ms and 1 s at 48 kHz
+SUFFIX = ".env.npz"
+READ_FRAMES = 48000             # Frames read at once when a wav file is indexed afterwards
+
+
+def sidecar_path(recording):
+    return recording + SUFFIX
+
+
+class EnvelopeWriter:
+    """Builds the envelope levels of one recording while it is written."""
+
+    def __init__(self, channels, rate=audio_device.SAMPLE_RATE, levels=LEVELS):
+        if any(fine <= 0 or coarse % fine for fine, coarse in zip(levels, levels[1:])):
+            raise ValueError("every level has to be a multiple of the level before it")
+        self.channels = channels
+        self.rate = rate
+        self.levels = list(levels)
+        self.frames = 0
+        self.pending = np.zeros((0, channels), dtype=np.float64)
+        # Finished bins per level: lists of (min, max, sum of squares, frames) arrays.
+        self.bins = [[] for _ in self.levels]
+        # Bins of each level that don't fill a bin of the next level yet.
+        self.partial = [[] for _ in self.levels]
+
+    def add(self, block):
+        """Add (frames, channels) int32 samples."""
+        self.frames += len(block)
+        data = np.concatenate((self.pending, np.asarray(block, dtype=np.float64) / 2**31))
+        size = self.levels[0]
+        full = len(data) // size
+        self.pending = data[full * size:]
+        if full:
+            frames = data[:full * size].reshape(full, size, self.channels)
+            self.add_bins(0, frames.min(axis=1), frames.max(axis=1), np.square(frames).sum(axis=1),
+                          np.full(full, size))
+
+    def add_bins(self, level, low, high, energy, count):
+        self.bins[level].append((low, high, energy, count))
+        if level + 1 == len(self.levels):
+            return
+        self.partial[level].append((low, high, energy, count))
+        low, high, energy, count = (np.concatenate(part) for part in zip(*self.partial[level]))
+        factor = self.levels[level + 1] // self.levels[level]
+        full = len(count) // factor
+        self.partial[level] = [(low[full * factor:], high[full * factor:], energy[full * factor:],
+                                count[full * factor:])]
+        if full:
+            shape = (full, factor, self.channels)
+            self.add_bins(level + 1, low[:full * factor].reshape(shape).min(axis=1),
+                          high[:full * factor].reshape(shape).max(axis=1),
+                          energy[:full * factor].reshape(shape).sum(axis=1),
+                          count[:full * factor].reshape(full, factor).sum(axis=1))
+
+    def finish(self):
+        """Return {level: (bins, channels, 3) min/max/RMS array}, the last bins may be partial."""
+        if len(self.pending):
+            frames = self.pending[None]
+            self.pending = self.pending[:0]
+            self.add_bins(0, frames.min(axis=1), frames.max(axis=1), np.square(frames).sum(axis=1),
+                          np.array([frames.shape[1]]))
+        # Flush the partial bins from fine to coarse, so each feeds the next level.
+        for level in range(len(self.levels) - 1):
+            if not self.partial[level]:
+                continue
+            low, high, energy, count = (np.concatenate(part) for part in zip(*self.partial[level]))
+            self.partial[level] = []
+            if len(count):
+                last = (low.min(axis=0)[None], high.max(axis=0)[None], energy.sum(axis=0)[None],
+                        count.sum(keepdims=True))
+                self.bins[level + 1].append(last)
+                if level + 2 < len(self.levels):
+                    self.partial[level + 1].append(last)
+        envelope = {}
+        for size, bins in zip(self.levels, self.bins):
+            if not bins:
+                envelope[size] = np.zeros((0, self.channels, 3), dtype=np.float32)
+                continue
+            low, high, energy, count = (np.concatenate(part) for part in zip(*bins))
+            rms = np.sqrt(energy / count[:, None])
+            envelope[size] = np.stack((low, high, rms), axis=-1).astype(np.float32)
+        return envelope
+
+    def save(self, path):
+        """Write the sidecar of the recording at path."""
+        envelope = self.finish()
+        np.savez(sidecar_path(path), rate=self.rate, frames=self.frames, levels=np.array(self.levels),
+                 **{f"level_{size}": bins for size, bins in envelope.items()})
+
+
+class Envelope:
+    """Reads the levels of a sidecar, each only when it is asked for."""
+
+    def __init__(self, recording):
+        self.file = np.load(sidecar_path(recording))
+        self.rate = int(self.file["rate"])
+        self.duration = int(self.file["frames"]) / self.rate
+        self.levels = [int(size) for size in self.file["levels"]]
+
+    def level(self, size):
+        """(bins, channels, 3) min/max/RMS array of the level with size frames per bin."""
+        return self.file[f"level_{size}"]
+
+    def view(self, start=0.0, end=None, points=1000):
+        """Return the bin length in seconds and the bins between start and end
+        seconds, from the coarsest level that still gives at least points bins."""
+        end = self.duration if end is None else end
+        size = self.levels[0]
+        for candidate in self.levels:
+            if (end - start) * self.rate / candidate >= points:
+                size = candidate
+        first = int(start * self.rate // size)
+        last = int(np.ceil(end * self.rate / size))
+        return size / self.rate, self.level(size)[first:last]
+
+    def close(self):
+        self.file.close()
+
+
+def index_wav(path):
+    """Write the sidecar of an existing 32 bit wav recording."""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 4:
+            raise ValueError(f"{path} is not a 32 bit recording")
+        writer = EnvelopeWriter(wf.getnchannels(), wf.getframerate())
+        while True:
+            frames = wf.readframes(READ_FRAMES)
+            if not frames:
+                break
+            writer.add(np.frombuffer(frames, dtype=np.int32).reshape(-1, wf.getnchannels()))
+    writer.save(path)
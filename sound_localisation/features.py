@@ -0,0 +1,115 @@
+"""
+Cache of the spectral features of recordings, so re-analysing them with
+other settings reads the FFTs instead of computing them again.
+
+For every recording the cache holds, in <cache>/<recording name>_<hash>.npz
+(a hash of the resolved path, so recordings with the same name in other
+folders get their own entry):
+
+    magnitudes  STFT magnitude per frame, bin and channel (float16)
+    cross       summed cross-spectrum of every pair of channels (complex64),
+                enough for GCC-PHAT over the whole recording
+    phases      mean phase-only cross-spectrum of every pair (complex64), for
+                a confidence on the scale of process_window
+    energy      sum of squares per channel, for the level
+
+with the parameters that produced them. The parameters include the size
+and modification time of the recording, so an entry is computed again when
+the frame length changes, the code that computes them changes (VERSION)
+or the recording is replaced.
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+import numpy as np
+
+from . import config
+from . import spl
+from .analyse import read_wav
+from .geometry import default as default_geometry, pairs
+from .localise import cross_spectrum_lags, direction_to_angles, phat_heights
+
+
+VERSION = 3                 # Raise when compute() changes
+FRAME = 1024                # Samples per STFT frame, half overlapping
+
+Features = namedtuple("Features", "magnitudes cross phases energy frames rate frame")
+
+
+def cache_dir(settings=None):
+    return os.path.join(config.data_dir(settings), "cache", "features")
+
+
+def compute(data, rate, frame=FRAME):
+    """Features of an int32 (frames, channels) recording."""
+    step = frame // 2
+    taper = np.hanning(frame)[:, None]
+    base = [a for a, _ in pairs(data.shape[1])]
+    axis = [b for _, b in pairs(data.shape[1])]
+    count = max(0, (len(data) - frame) // step + 1)
+    magnitudes = np.zeros((count, frame // 2 + 1, data.shape[1]), dtype=np.float16)
+    cross = np.zeros((len(base), frame + 1), dtype=np.complex128)
+    phases = np.zeros_like(cross)
+    for i in range(count):
+        spectrum = np.fft.rfft(data[i * step:i * step + frame] / 2**31 * taper, n=2 * frame, axis=0)
+        # Zero padded to twice the frame for the lags; every other bin is the plain STFT.
+        magnitudes[i] = np.abs(spectrum[::2])
+        frame_cross = (spectrum[:, base] * np.conj(spectrum[:, axis])).T
+        cross += frame_cross
+        phases += frame_cross / (np.abs(frame_cross) + 1e-15)
+    energy = spl.sum_of_squares(data) / 2.0**62
+    return Features(magnitudes, cross.astype(np.complex64), (phases / max(count, 1)).astype(np.complex64), energy,
+                    len(data), rate, frame)
+
+
+def localise(features, offset, geometry=None):
+    """phi, theta, confidence and SPL per channel, like process_window."""
+    geometry = geometry or default_geometry()
+    if len(features.energy) != geometry.channels:
+        raise ValueError(f"the recording has {len(features.energy)} channels, the geometry {geometry.channels}")
+    # The cache holds every pair, the geometry may use some of them.
+    every = pairs(geometry.channels)
+    used = [every.index(pair) for pair in geometry.pairs]
+    lags, _ = cross_spectrum_lags(features.cross[used], 2 * features.frame, geometry.max_lags)
+    phi, theta = direction_to_angles(*geometry.direction(lags))
+    confidence = float(phat_heights(features.phases[used], 2 * features.frame, lags).min())
+    return phi, theta, confidence, spl.from_mean_square(features.energy / max(features.frames, 1), offset)
+
+
+class FeatureCache:
+    """Features of recordings, computed the first time they are asked for."""
+
+    def __init__(self, folder=None, frame=FRAME, settings=None):
+        self.folder = folder or cache_dir(settings)
+        self.frame = frame
+        os.makedirs(self.folder, exist_ok=True)
+
+    def parameters(self, recording):
+        stat = os.stat(recording)
+        return {"version": VERSION, "frame": self.frame, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def path(self, recording):
+        where = hashlib.sha1(os.path.realpath(recording).encode()).hexdigest()[:12]
+        return os.path.join(self.folder, f"{os.path.basename(recording)}_{where}.npz")
+
+    def get(self, recording):
+        """Return the Features of a 32 bit wav recording."""
+        parameters = self.parameters(recording)
+        path = self.path(recording)
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                if json.loads(str(cached["parameters"])) == parameters:
+                    return Features(cached["magnitudes"], cached["cross"], cached["phases"], cached["energy"],
+                                    int(cached["frames"]), int(cached["rate"]), self.frame)
+            os.remove(path)
+
+        data, rate = read_wav(recording)
+        features = compute(data, rate, self.frame)
+        temporary = path + ".tmp.npz"
+        np.savez(temporary, parameters=json.dumps(parameters), magnitudes=features.magnitudes,
+                 cross=features.cross, phases=features.phases, energy=features.energy, frames=features.frames,
+                 rate=features.rate)
+        os.replace(temporary, path)
+        return features
@@ -0,0 +1,109 @@
+"""
+Microphone positions of the array and the direction solver.
+
+The array is described by the position of every channel in metres, in the
+array frame (x, y and z axes, phi from x towards y, theta from z), as
+"geometry" in variables.json:
+
+    "geometry": {"positions": [[0, 0, 0], [0, 0, 0.2], [0.1, 0, 0], [0, 0.1, 0]]}
+
+optionally with "weights", one per channel pair of pairs(). A configured
+geometry uses all pairs, and GCC-PHAT only searches the lags the array
+can produce (with LAG_MARGIN), which keeps spurious peaks of short or
+noisy windows out of the fit. Only the shape of a non-planar array
+matters for the direction, the spacing has to be right for planar arrays
+and for max_lags.
+
+Without a configured geometry the wiring of the demo is assumed: channel
+0 at the origin, channel 2 on the x axis, channel 3 on the y axis and
+channel 1 above channel 0 at twice the spacing. Then only the pairs of
+channel 0 with the others are used (LEGACY_PAIRS) and every lag is
+searched. With three pairs the fit is exact, so existing deployments
+keep the bearings and confidences of the original x, y and z delay
+solver; configuring the geometry switches to all pairs.
+
+For a far source the lag of every pair (a, b), t_a - t_b in samples, is
+(p_b - p_a) . u * rate / speed for the unit vector u towards the source.
+The lags of all pairs are solved for u with weighted least squares; the
+pseudo-inverse depends on the geometry only, so it is computed once and a
+direction costs one (3, pairs) matrix product. A planar array can't tell
+above from below: u is put on the positive side of its normal.
+"""
+
+import itertools
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+
+
+# === Geometry Configuration ===
+SPEED_OF_SOUND = 343.0      # m/s, in air at 20 degrees
+SPACING = 0.1               # m, default distance of channel 2 and 3 to channel 0
+LAG_MARGIN = 1.2            # Lags searched, relative to the longest a pair can produce
+DEFAULT_POSITIONS = [[0.0, 0.0, 0.0], [0.0, 0.0, 2 * SPACING], [SPACING, 0.0, 0.0], [0.0, SPACING, 0.0]]
+LEGACY_PAIRS = [(0, 2), (0, 3), (0, 1)]     # x, y and z delays of the original solver
+
+_default = None
+
+
+def pairs(channels):
+    """Every pair of channels once, (a, b) with a < b."""
+    return list(itertools.combinations(range(channels), 2))
+
+
+class Geometry:
+    """Array geometry with its precomputed least squares direction solver."""
+
+    def __init__(self, positions, weights=None, rate=audio_device.SAMPLE_RATE, speed=SPEED_OF_SOUND,
+                 limit_lags=True, channel_pairs=None):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.channels = len(self.positions)
+        self.pairs = [tuple(pair) for pair in channel_pairs] if channel_pairs else pairs(self.channels)
+        base = [a for a, _ in self.pairs]
+        axis = [b for _, b in self.pairs]
+        # Lag in samples per pair of a unit vector along x, y and z.
+        self.matrix = (self.positions[axis] - self.positions[base]) * rate / speed
+        self.max_lags = None
+        if limit_lags:
+            self.max_lags = np.ceil(np.linalg.norm(self.matrix, axis=1) * LAG_MARGIN).astype(int) + 1
+
+        weights = np.ones(len(self.pairs)) if weights is None else np.asarray(weights, dtype=np.float64)
+        root = np.sqrt(weights)
+        self.solver = np.linalg.pinv(self.matrix * root[:, None]) * root[None, :]
+
+        _, singular, vectors = np.linalg.svd(self.matrix)
+        if np.sum(singular > 1e-9 * singular[0]) < 2:
+            raise ValueError("the microphones are on one line, the direction can't be solved")
+        self.normal = None
+        if singular[2] <= 1e-9 * singular[0]:
+            self.normal = vectors[2] * (1 if vectors[2][np.argmax(np.abs(vectors[2]))] > 0 else -1)
+
+    def direction(self, lags):
+        """Unit vectors (..., 3) towards the source from lags (..., pairs)."""
+        vector = np.asarray(lags, dtype=np.float64) @ self.solver.T
+        length = np.linalg.norm(vector, axis=-1, keepdims=True)
+        if self.normal is not None:
+            # The solver has nothing along the normal, that part follows from |u| = 1.
+            vector = vector + np.sqrt(np.maximum(1 - length ** 2, 0)) * self.normal
+            length = np.linalg.norm(vector, axis=-1, keepdims=True)
+        return vector / np.maximum(length, 1e-12)
+
+
+def from_settings(settings=None):
+    """The configured geometry. Without one the default positions are used
+    with the legacy pairs, and every lag is searched, because the spacing is
+    a guess."""
+    settings = settings or config.load()
+    geometry = settings.get("geometry")
+    if not geometry:
+        return Geometry(DEFAULT_POSITIONS, limit_lags=False, channel_pairs=LEGACY_PAIRS)
+    return Geometry(geometry["positions"], geometry.get("weights"))
+
+
+def default():
+    """The geometry of variables.json, loaded once per process."""
+    global _default
+    if _default is None:
+        _default = from_settings()
+    return _default
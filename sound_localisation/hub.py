@@ -0,0 +1,266 @@
+"""
+Capture hub: one process owns the i2smaster device and every other
+command reads the audio from shared memory, so the demo, the recorder and
+the experiments can run at the same time.
+
+The hub writes every block into a ring of RING_SECONDS in a
+multiprocessing.shared_memory segment called HUB_NAME and then raises the
+frame counter in its header. Readers attach to the segment and keep their
+own position, so they read at their own pace. The hub never waits for a
+reader: a reader that falls more than the ring behind is moved forward
+and told how many frames it missed. The header also holds the largest
+block the hub writes, the block after the counter may be half written at
+any time, so readers keep that much away from the writer.
+
+Shared memory layout: HEADER int64 values (see the indices below),
+followed by the ring of (capacity, channels) int32 frames.
+
+audio.open_input() uses a running hub automatically, run it with
+`python -m sound_localisation hub`.
+"""
+
+import os
+import threading
+import time
+import numpy as np
+
+from . import audio as audio_device
+
+
+# === Hub Configuration ===
+HUB_NAME = "sound_localisation_hub"
+RING_SECONDS = 10           # Audio kept in the ring, readers may lag this much
+MAGIC = 0x54534831          # "TSH1"
+
+# === Header ===
+HEADER = 8
+H_MAGIC, H_SEQUENCE, H_CAPACITY, H_CHANNELS, H_RATE, H_PID, H_BLOCK = range(7)
+
+PA_INPUT_OVERFLOW = 2       # pyaudio.paInputOverflow, passed to callbacks of readers that lagged
+
+
+def attach(name=HUB_NAME):
+    """Open an existing segment without letting this process remove it at exit."""
+    from multiprocessing import resource_tracker, shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the segment, which would unlink it
+        # when the reader exits.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def header_and_ring(shm, capacity=None, channels=None):
+    header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+    if capacity is None:
+        capacity, channels = int(header[H_CAPACITY]), int(header[H_CHANNELS])
+    ring = np.ndarray((capacity, channels), dtype=np.int32, buffer=shm.buf, offset=HEADER * 8)
+    return header, ring
+
+
+def is_running(name=HUB_NAME):
+    """True when a hub segment exists and the process that writes it is alive."""
+    try:
+        shm = attach(name)
+    except (FileNotFoundError, OSError):
+        return False
+    try:
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+        if header[H_MAGIC] != MAGIC:
+            return False
+        os.kill(int(header[H_PID]), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but started by another user.
+        return True
+    finally:
+        del header
+        shm.close()
+
+
+class Hub:
+    """Owns the device and writes every block into the shared ring."""
+
+    def __init__(self, name=HUB_NAME, seconds=RING_SECONDS, channels=audio_device.CHANNELS,
+                 rate=audio_device.SAMPLE_RATE):
+        self.name = name
+        self.capacity = int(seconds * rate)
+        self.channels = channels
+        self.rate = rate
+        self.shm = None
+        self.stream = None
+
+    def callback(self, in_data, frame_count, time_info, status):
+        block = np.frombuffer(in_data, dtype=np.int32).reshape(-1, self.channels)
+        if len(block) > self.header[H_BLOCK]:
+            self.header[H_BLOCK] = len(block)
+        sequence = int(self.header[H_SEQUENCE])
+        start = sequence % self.capacity
+        end = start + len(block)
+        if end <= self.capacity:
+            self.ring[start:end] = block
+        else:
+            split = self.capacity - start
+            self.ring[start:] = block[:split]
+            self.ring[:end - self.capacity] = block[split:]
+        # The counter is raised after the frames are in place.
+        self.header[H_SEQUENCE] = sequence + len(block)
+        return (None, audio_device.PA_CONTINUE)
+
+    def start(self, audio):
+        from multiprocessing import shared_memory
+
+        if is_running(self.name):
+            raise SystemExit("A capture hub is already running.")
+        try:
+            # Left behind by a hub that was killed.
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True,
+                                              size=HEADER * 8 + self.capacity * self.channels * 4)
+        self.header, self.ring = header_and_ring(self.shm, self.capacity, self.channels)
+        self.header[:] = 0
+        self.header[H_CAPACITY] = self.capacity
+        self.header[H_CHANNELS] = self.channels
+        self.header[H_RATE] = self.rate
+        self.header[H_PID] = os.getpid()
+        self.header[H_MAGIC] = MAGIC
+
+        # The device is opened by index, so open_input doesn't read from this hub itself.
+        dev_index, frames_per_buffer = audio_device.configured_device(audio)
+        self.header[H_BLOCK] = frames_per_buffer or audio_device.CHUNK
+        self.stream = audio_device.open_input(audio, self.callback, channels=self.channels, rate=self.rate,
+                                              frames_per_buffer=frames_per_buffer, dev_index=dev_index)
+        self.stream.start_stream()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+        if self.shm is not None:
+            self.header[H_MAGIC] = 0
+            del self.header, self.ring
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class HubReader:
+    """Reads the frames of a running hub, starting at the newest frame."""
+
+    def __init__(self, name=HUB_NAME):
+        self.shm = attach(name)
+        self.header, self.ring = header_and_ring(self.shm)
+        self.capacity, self.channels = self.ring.shape
+        self.rate = int(self.header[H_RATE])
+        self.position = int(self.header[H_SEQUENCE])
+        self.missed = 0             # Frames skipped because this reader lagged
+
+    def available(self):
+        return int(self.header[H_SEQUENCE]) - self.position
+
+    def read(self, frames):
+        """Return the next frames as a (frames, channels) copy and the number
+        of frames skipped before them, or (None, 0) when they aren't there yet."""
+        skipped = 0
+        while True:
+            sequence = int(self.header[H_SEQUENCE])
+            block = int(self.header[H_BLOCK])
+            if sequence - self.position > self.capacity - frames - block:
+                # Fallen behind: continue halfway the ring, clear of the writer.
+                newest = sequence - self.capacity // 2
+                skipped += newest - self.position
+                self.position = newest
+            if sequence - self.position < frames:
+                self.missed += skipped
+                return None, skipped
+
+            start = self.position % self.capacity
+            end = start + frames
+            if end <= self.capacity:
+                data = self.ring[start:end].copy()
+            else:
+                data = np.concatenate((self.ring[start:], self.ring[:end - self.capacity]))
+
+            # The hub may have overwritten these frames while they were copied,
+            # or be writing the block after the counter over them.
+            if int(self.header[H_SEQUENCE]) - self.position <= self.capacity - block:
+                self.position += frames
+                self.missed += skipped
+                return data, skipped
+
+    def close(self):
+        del self.header, self.ring
+        self.shm.close()
+
+
+class HubStream:
+    """Stands in for a PyAudio callback stream, fed from the hub by a thread."""
+
+    def __init__(self, callback, channels, frames_per_buffer, name=HUB_NAME):
+        self.reader = HubReader(name)
+        if channels > self.reader.channels:
+            raise ValueError(f"The hub has {self.reader.channels} channels, {channels} are asked")
+        self.callback = callback
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.active = threading.Event()
+        self.thread = None
+
+    def start_stream(self):
+        # Like a stream, start with the audio from now on.
+        self.reader.position = int(self.reader.header[H_SEQUENCE])
+        self.active.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        period = self.frames_per_buffer / self.reader.rate
+        while self.active.is_set():
+            data, skipped = self.reader.read(self.frames_per_buffer)
+            if data is None:
+                time.sleep(period / 4)
+                continue
+            status = PA_INPUT_OVERFLOW if skipped else 0
+            in_data = np.ascontiguousarray(data[:, :self.channels]).tobytes()
+            _, flag = self.callback(in_data, self.frames_per_buffer, None, status)
+            if flag != audio_device.PA_CONTINUE:
+                self.active.clear()
+
+    def is_active(self):
+        return self.active.is_set()
+
+    def stop_stream(self):
+        self.active.clear()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def close(self):
+        self.stop_stream()
+        self.reader.close()
+
+
+def run():
+    """Own the device until interrupted."""
+    audio = audio_device.open_audio()
+    hub = Hub()
+    try:
+        hub.start(audio)
+        print(f"Capture hub running, {hub.channels} channels at {hub.rate} Hz in {hub.name}. Press Ctrl+C to stop.")
+        while hub.stream.is_active():
+            time.sleep(1)
+            print(f"\r{int(hub.header[H_SEQUENCE]) / hub.rate:.0f} s captured", end="", flush=True)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        hub.stop()
+        audio.terminate()
@@ -0,0 +1,227 @@
+"""
+Direction and level of one multichannel window.
+
+The GCC-PHAT lag of every pair of channels goes into the least squares
+solver of the array geometry (see geometry.py), which is the one of
+variables.json unless another is passed.
+"""
+
+from collections import deque
+import numpy as np
+
+from . import spl
+from .geometry import default as default_geometry
+
+
+# === Adaptive Window ===
+MIN_WINDOW = 1200           # Frames, 25 ms, the shortest window tried
+GROWTH = 4                  # Factor the window grows by while the peak isn't significant
+SIGNIFICANCE = 4.0          # GCC-PHAT peak over the highest peak expected from noise
+
+
+def gcc_phat(base, axis):
+    """Return the lag of axis relative to base and the height of the
+    GCC-PHAT peak, which is 1 for a perfectly coherent pair."""
+    n = len(base) + len(axis)
+    SIG1 = np.fft.rfft(base, n=n)
+    SIG2 = np.fft.rfft(axis, n=n)
+    R = SIG1 * np.conj(SIG2)
+    R /= np.abs(R) + 1e-15
+    corr = np.fft.irfft(R, n=n)
+    max_shift = n // 2
+    corr = np.concatenate((corr[-max_shift:], corr[:max_shift]))
+    peak = np.argmax(corr)
+    return peak - max_shift, corr[peak]
+
+
+def get_signal_lag(base, axis):
+    return gcc_phat(base, axis)[0]
+
+
+def get_spl(buffer, offset):
+    """Sound pressure level per channel of an int32-scaled buffer."""
+    return spl.leq(buffer, offset)
+
+
+def phat_lag(cross, n, max_lag=None):
+    """Lag and peak height of the GCC-PHAT of one cross-spectrum of signals
+    zero padded to n. With max_lag only the lags up to it are searched."""
+    corr = np.fft.irfft(cross / (np.abs(cross) + 1e-15), n=n)
+    if max_lag is None:
+        max_shift = n // 2
+        corr = np.concatenate((corr[-max_shift:], corr[:max_shift]))
+    else:
+        max_shift = min(int(max_lag), n // 2 - 1)
+        corr = np.concatenate((corr[n - max_shift:], corr[:max_shift + 1]))
+    peak = np.argmax(corr)
+    return peak - max_shift, corr[peak]
+
+
+def cross_spectrum_lags(cross, n, max_lags=None):
+    """Lags and peak heights of (pairs, n // 2 + 1) cross-spectra, with
+    max_lags (one per pair) only the lags the array can produce are searched."""
+    found = [phat_lag(cross[i], n, None if max_lags is None else max_lags[i]) for i in range(len(cross))]
+    return np.array([lag for lag, _ in found]), np.array([peak for _, peak in found])
+
+
+def phat_heights(phases, n, lags):
+    """Height at lags (one per pair) of the GCC-PHAT of (pairs, n // 2 + 1)
+    averaged phase-only cross-spectra. For the mean over the frames of a
+    window this is the peak process_window finds over the whole window."""
+    corr = np.fft.irfft(phases, n=n)
+    return corr[np.arange(len(lags)), np.asarray(lags) % n]
+
+
+def get_lags(buffer, pairs, max_lags=None):
+    """Lag of b relative to a in samples and the GCC-PHAT peak height of every
+    pair (a, b) of channels, with one FFT per channel."""
+    n = 2 * len(buffer)
+    # Channel by channel, a strided (frames, channels) FFT is slower than separate ones.
+    spectra = {ch: np.fft.rfft(buffer[:, ch], n=n) for ch in sorted({ch for pair in pairs for ch in pair})}
+    found = [phat_lag(spectra[a] * np.conj(spectra[b]), n, None if max_lags is None else max_lags[i])
+             for i, (a, b) in enumerate(pairs)]
+    return np.array([lag for lag, _ in found]), np.array([peak for _, peak in found])
+
+
+def get_direction(buffer, geometry=None):
+    """Return x, y and z of the unit vector towards the source and a 0..1
+    confidence, the lowest peak of all pairs."""
+    geometry = geometry or default_geometry()
+    lags, peaks = get_lags(buffer, geometry.pairs, geometry.max_lags)
+    x, y, z = geometry.direction(lags)
+    return x, y, z, float(peaks.min())
+
+
+def direction_to_angles(x, y, z):
+    phi = np.arctan2(y, x)
+    theta = np.arctan2(np.sqrt(x ** 2 + y ** 2), z)
+    return phi, theta
+
+
+def process_window(buffer, offset, geometry=None, level=None):
+    """Return phi, theta, a 0..1 confidence and the SPL per channel. level is
+    the SPL of buffer when the caller keeps it up to date itself."""
+    x, y, z, confidence = get_direction(buffer, geometry)
+    phi, theta = direction_to_angles(x, y, z)
+    return phi, theta, confidence, get_spl(buffer, offset) if level is None else level
+
+
+def significance(peak, n):
+    """GCC-PHAT peak height relative to the highest of n correlation values of
+    uncorrelated noise, about sqrt(2 ln(n) / n). Noise gives about 1."""
+    return peak / np.sqrt(2 * np.log(n) / n)
+
+
+def process_adaptive(buffer, offset, minimum=MIN_WINDOW, start=None, growth=GROWTH, threshold=SIGNIFICANCE,
+                     geometry=None, level=None):
+    """process_window on the newest frames of buffer, from start (minimum by
+    default) frames growing by growth until the peak is significant or the
+    whole buffer is used. Returns the estimate and the frames used. Only the
+    direction comes from the shorter window, the SPL is over the whole
+    buffer like process_window (or level), so levels don't depend on the
+    source."""
+    frames = min(max(start or minimum, minimum), len(buffer))
+    while True:
+        window = buffer[-frames:]
+        x, y, z, confidence = get_direction(window, geometry)
+        if frames == len(buffer) or significance(confidence, 2 * frames) >= threshold:
+            break
+        frames = min(frames * growth, len(buffer))
+    phi, theta = direction_to_angles(x, y, z)
+    return (phi, theta, confidence, get_spl(buffer, offset) if level is None else level), frames
+
+
+class SlidingCrossSpectrum:
+    """GCC-PHAT over a sliding window, updated frame by frame.
+
+    The window is covered by half overlapping frames of frame samples. The
+    cross-spectrum of every new frame is added to a running sum per pair
+    and the one of the frame that left the window is subtracted, so an
+    update costs the FFT of one frame and an inverse FFT per pair, however
+    long the window is. The pairs are all pairs of the geometry.
+
+    The lags come from the summed cross-spectra, which resolves weaker
+    sources than one FFT over the window. Its peak is higher too, so the
+    confidence is taken from a second sum, of the phase-only cross-spectra
+    of the frames: their mean at the lags found is the confidence
+    process_window gives for the same window, whatever the frame length.
+    """
+
+    def __init__(self, window, frame=1024, channels=4, geometry=None):
+        self.geometry = geometry or default_geometry()
+        self.pairs = self.geometry.pairs
+        self.frame = frame
+        self.step = frame // 2
+        self.n = 2 * frame              # Zero padded, like gcc_phat
+        self.taper = np.hanning(frame)[:, None]
+        self.count = max(1, (window - frame) // self.step + 1)
+        self.base = [a for a, _ in self.pairs]
+        self.axis = [b for _, b in self.pairs]
+        self.spectra = deque()
+        self.phases = deque()
+        self.energies = deque()
+        self.sum = np.zeros((len(self.pairs), self.n // 2 + 1), dtype=np.complex128)
+        self.phase_sum = np.zeros_like(self.sum)
+        self.energy = np.zeros(channels)
+        self.tail = np.zeros((0, channels))
+        self.updates = 0
+
+    @property
+    def ready(self):
+        """True once the frames fill a whole window."""
+        return len(self.spectra) == self.count
+
+    def add(self, samples):
+        """Add (frames, channels) new samples, return the number of new frames."""
+        tail = np.concatenate((self.tail, samples))
+        added = 0
+        start = 0
+        while len(tail) - start >= self.frame:
+            self.add_frame(tail[start:start + self.frame])
+            start += self.step
+            added += 1
+        self.tail = tail[start:]
+        return added
+
+    def add_frame(self, frame):
+        spectrum = np.fft.rfft(frame * self.taper, n=self.n, axis=0)
+        cross = (spectrum[:, self.base] * np.conj(spectrum[:, self.axis])).T
+        phase = cross / (np.abs(cross) + 1e-15)
+        # Every sample is in the first half of exactly one frame.
+        energy = np.sum(np.square(frame[:self.step] / 2**31), axis=0)
+
+        self.spectra.append(cross)
+        self.phases.append(phase)
+        self.energies.append(energy)
+        self.sum += cross
+        self.phase_sum += phase
+        self.energy += energy
+        if len(self.spectra) > self.count:
+            self.sum -= self.spectra.popleft()
+            self.phase_sum -= self.phases.popleft()
+            self.energy -= self.energies.popleft()
+
+        # Start the sums over now and then, so rounding errors don't add up.
+        self.updates += 1
+        if self.updates >= self.count:
+            self.updates = 0
+            self.sum = np.sum(self.spectra, axis=0)
+            self.phase_sum = np.sum(self.phases, axis=0)
+            self.energy = np.sum(self.energies, axis=0)
+
+    def get_direction(self):
+        """Like get_direction, for the current window."""
+        lags, _ = cross_spectrum_lags(self.sum, self.n, self.geometry.max_lags)
+        x, y, z = self.geometry.direction(lags)
+        heights = phat_heights(self.phase_sum / max(len(self.phases), 1), self.n, lags)
+        return x, y, z, float(heights.min())
+
+    def get_spl(self, offset):
+        """Sound pressure level per channel over the window."""
+        return spl.from_mean_square(self.energy / (len(self.energies) * self.step), offset)
+
+    def process_window(self, offset):
+        """Like process_window, for the current window."""
+        x, y, z, confidence = self.get_direction()
+        phi, theta = direction_to_angles(x, y, z)
+        return phi, theta, confidence, self.get_spl(offset)
@@ -0,0 +1,106 @@
+"""
+Remembers the results of the offline analysis.
+
+A result is stored under a key made of the hash of the audio, the
+analysis settings and the code version (a hash of the source of the
+modules the analysis runs), so analysing the same recording again with
+the same settings and code returns the stored result straight away, and
+anything that could change the result leads to a new key.
+
+The results are small json files in cache/results in the data folder.
+Every hit touches its file, and when the folder grows over MAX_MB the
+files that weren't used longest are deleted.
+"""
+
+import hashlib
+import json
+import os
+
+from . import config
+
+
+MAX_MB = 64
+READ_BYTES = 1 << 20
+CODE_MODULES = ["analyse.py", "features.py", "geometry.py", "localise.py", "spl.py"]
+
+
+def results_dir(settings=None):
+    return os.path.join(config.data_dir(settings), "cache", "results")
+
+
+def code_version():
+    """Hash of the source of the modules that compute the results."""
+    digest = hashlib.sha256()
+    for name in CODE_MODULES:
+        with open(os.path.join(config.PACKAGE_DIR, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def content_hash(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(READ_BYTES)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """Size bounded, least recently used store of analysis results."""
+
+    def __init__(self, folder=None, max_mb=MAX_MB, settings=None):
+        self.folder = folder or results_dir(settings)
+        self.max_bytes = int(max_mb * 1e6)
+        self.code = code_version()
+        os.makedirs(self.folder, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(self.folder) if entry.is_file())
+
+    def key(self, recording, parameters, audio=None):
+        """audio is the content_hash of recording, when the caller has it already."""
+        text = json.dumps({"audio": audio or content_hash(recording), "parameters": parameters, "code": self.code},
+                          sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        path = os.path.join(self.folder, key + ".json")
+        try:
+            with open(path, 'r') as file:
+                result = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        path = os.path.join(self.folder, key + ".json")
+        temporary = path + ".tmp"
+        with open(temporary, 'w') as file:
+            json.dump(result, file)
+        os.replace(temporary, path)
+        self.size += os.path.getsize(path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used results until the store is at 3/4 of its size."""
+        entries = sorted((entry for entry in os.scandir(self.folder) if entry.is_file()),
+                         key=lambda entry: entry.stat().st_mtime)
+        self.size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes * 3 // 4:
+                break
+            self.size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def memoize(self, recording, parameters, compute, audio=None):
+        """Return the stored result of recording for parameters, or compute(),
+        which has to return something json can store, and store it."""
+        key = self.key(recording, parameters, audio)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
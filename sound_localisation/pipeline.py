@@ -0,0 +1,176 @@
+"""
+Continuous capture -> analysis pipeline shared by the demo and the
+headless estimate stream.
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+from . import geometry
+from . import spl
+from .localise import GROWTH, SlidingCrossSpectrum, process_adaptive, process_window
+
+
+# === Pipeline Configuration ===
+WINDOW = audio_device.SAMPLE_RATE   # Frames per analysis window (1 s)
+HOP = audio_device.CHUNK            # Frames between two estimates, sets the refresh rate
+
+
+class Pipeline:
+    """Continuous capture -> analysis pipeline.
+
+    The PortAudio callback only queues raw blocks, so capture never waits
+    on the analysis. A worker thread keeps a sliding window of the last
+    WINDOW frames and runs process_window every HOP frames. Finished
+    estimates (timestamp, phi, theta, confidence, spl, heading) are queued
+    in results and announced on a wake-up pipe, so a UI can select() on it
+    together with the keyboard. heading is the last filtered compass
+    heading, or nan without compass or when its heading is stale.
+
+    With min_window set, WINDOW is the longest window: every estimate
+    starts from a short window and only grows it while the GCC-PHAT peak
+    isn't significant (see process_adaptive), so loud impacts resolve from
+    the last tens of milliseconds and only weak sources cost the whole
+    window. It starts one step below the length the previous estimate
+    needed, so a steady source doesn't climb from the minimum every hop.
+    window_used is the length of the last estimate.
+
+    With frame set, the window isn't kept at all: every frame of that many
+    samples goes into a SlidingCrossSpectrum and an estimate only costs
+    the inverse FFTs, so a short hop stays affordable.
+    """
+
+    def __init__(self, audio, window=WINDOW, hop=HOP, compass=None, settings=None, frame=None, min_window=None):
+        settings = settings or config.load()
+        self.audio = audio
+        self.compass = compass
+        self.window = window
+        self.hop = hop
+        self.offset = spl.offsets(settings, audio_device.CHANNELS)
+        self.geometry = geometry.from_settings(settings)
+        self.frame = settings["frame"] if frame is None else frame
+        self.min_window = settings["min_window"] if min_window is None else min_window
+        self.window_used = window
+        self.blocks = queue.Queue()
+        self.results = queue.Queue()
+        self.wake_r, self.wake_w = os.pipe()
+        self.running = threading.Event()
+        self.stream = None
+        self.worker = None
+
+    def callback(self, in_data, frame_count, time_info, status):
+        self.blocks.put_nowait((time.time(), in_data))
+        return (in_data, audio_device.PA_CONTINUE)
+
+    def start(self):
+        self.running.set()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+        self.stream = audio_device.open_input(self.audio, self.callback)
+        self.stream.start_stream()
+
+    def stop(self):
+        self.running.clear()
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+        self.blocks.put(None)
+        self.worker.join()
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def run(self):
+        channels = audio_device.CHANNELS
+        cross = None
+        if self.frame:
+            cross = SlidingCrossSpectrum(self.window, self.frame, channels, self.geometry)
+        ring = np.zeros((0 if cross else self.window, channels), dtype=np.float32)
+        write = 0       # Next write position in ring
+        filled = 0      # Valid frames in ring
+        pending = 0     # Frames received since the last estimate
+        # Sum of squares per channel of the ring, updated with the frames that are
+        # overwritten and summed again once per window, so rounding errors don't add up.
+        energy = np.zeros(channels)
+        written = 0
+
+        while self.running.is_set():
+            block = self.blocks.get()
+            if block is None:
+                break
+            # Drain everything that arrived meanwhile, only the newest window matters.
+            chunks = [block]
+            while True:
+                try:
+                    block = self.blocks.get_nowait()
+                except queue.Empty:
+                    break
+                if block is None:
+                    return
+                chunks.append(block)
+
+            for timestamp, chunk in chunks:
+                new_data = np.frombuffer(chunk, dtype=np.int32).reshape(-1, channels)
+                pending += len(new_data)
+                if cross is not None:
+                    cross.add(new_data)
+                    continue
+                if len(new_data) >= self.window:
+                    new_data = new_data[-self.window:]
+                end = write + len(new_data)
+                if end <= self.window:
+                    parts = [(write, end, new_data)]
+                else:
+                    split = self.window - write
+                    parts = [(write, self.window, new_data[:split]), (0, end - self.window, new_data[split:])]
+                for start, stop, part in parts:
+                    energy -= spl.sum_of_squares(ring[start:stop])
+                    ring[start:stop] = part
+                    energy += spl.sum_of_squares(ring[start:stop])
+                write = end % self.window
+                filled = min(filled + len(new_data), self.window)
+                written += len(new_data)
+                if written >= self.window:
+                    energy = spl.sum_of_squares(ring)
+                    written = 0
+
+            ready = cross.ready if cross is not None else filled == self.window
+            if not ready or pending < self.hop:
+                continue
+            pending = 0
+
+            if cross is not None:
+                estimate = cross.process_window(self.offset)
+            else:
+                # Unroll the ring so the window is contiguous in time.
+                buffer = np.concatenate((ring[write:], ring[:write]))
+                level = spl.leq_from_sums(energy, self.window, self.offset)
+                if self.min_window:
+                    estimate, self.window_used = process_adaptive(buffer, self.offset, self.min_window,
+                                                                  self.window_used // GROWTH, geometry=self.geometry,
+                                                                  level=level)
+                else:
+                    estimate = process_window(buffer, self.offset, self.geometry, level)
+            heading = math.nan
+            if self.compass is not None:
+                heading = self.compass.current()
+            self.results.put((timestamp, *estimate, heading))
+            os.write(self.wake_w, b'.')
+
+    def read_wakeup(self):
+        os.read(self.wake_r, 4096)
+
+    def drain(self):
+        """Return all estimates that are ready, oldest first."""
+        self.read_wakeup()
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
@@ -0,0 +1,230 @@
+"""
+Profiling of a running command, without restarting it.
+
+Every command installs a SIGUSR1 handler (see cli.py) and writes its pid
+to sound_localisation_<command>.pid in its runtime folder, and nothing
+else, so there is no cost while nobody profiles. The runtime folder,
+sound_localisation-<uid> in the temporary folder, is only accessible by
+the user, and the files in it are written to a new temporary file that
+is renamed, so nobody else can plant or redirect them. On the signal a sampler thread
+starts: every INTERVAL it takes the stack of every Python thread of the
+process (the main loop, the audio callback, workers, ...) from
+sys._current_frames() and counts it. After the duration the counts are
+written as collapsed stacks, one "thread;outer;...;inner count" line per
+stack, which flamegraph.pl, speedscope and inferno read directly.
+
+`python -m sound_localisation profile demo --duration 30` asks for a
+profile: it looks the pid of the command up in its pid file, leaves the
+duration in a request file, sends the signal and prints the file once it
+is written. Only processes with a pid file are signalled, SIGUSR1 ends a
+process without the handler. The profiles go to "profiles" in the data
+folder.
+"""
+
+import atexit
+import collections
+import glob
+import json
+import os
+import signal
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+from . import config
+
+
+# === Profiler Configuration ===
+DURATION = 30.0             # Seconds profiled when the request doesn't say
+INTERVAL = 0.005            # Seconds between samples
+PROFILE_SIGNAL = signal.SIGUSR1
+SUFFIX = ".folded"
+PID_PREFIX = "sound_localisation_"
+
+active = threading.Lock()   # Held while a profile runs, one at a time
+
+
+def runtime_dir():
+    """The private folder of the pid and request files, made when missing.
+    Raises PermissionError when it is not a folder of this user that only
+    this user can access."""
+    path = os.path.join(tempfile.gettempdir(), f"sound_localisation-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} is not a private folder of this user, remove it")
+    return path
+
+
+def request_path(pid):
+    return os.path.join(runtime_dir(), f"profile_{pid}.json")
+
+
+def pid_path(command):
+    return os.path.join(runtime_dir(), f"{PID_PREFIX}{command}.pid")
+
+
+def write_private(path, text):
+    """Write text to a new file only this user can read and rename it to path,
+    so an existing file or link at path is replaced, never followed."""
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(text)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def read_pid(path):
+    try:
+        with open(path, 'r') as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def running():
+    """{command: pid} of the other commands whose pid file names a live process."""
+    commands = {}
+    for path in glob.glob(pid_path("*")):
+        pid = read_pid(path)
+        if pid is None or pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            continue
+        except PermissionError:
+            pass
+        commands[os.path.basename(path)[len(PID_PREFIX):-len(".pid")]] = pid
+    return commands
+
+
+def resolve(target):
+    """pid of a running command, given by name or by pid. Raises ValueError
+    when no command with a pid file matches."""
+    commands = running()
+    if str(target).isdigit():
+        if int(target) in commands.values():
+            return int(target)
+    elif target in commands:
+        return commands[target]
+    listed = ", ".join(f"{command} ({pid})" for command, pid in sorted(commands.items())) or "none"
+    raise ValueError(f"No running sound_localisation command {target}, running: {listed}")
+
+
+def profiles_dir(settings=None):
+    return os.path.join(config.data_dir(settings), "profiles")
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(duration=DURATION, interval=INTERVAL):
+    """Count the stacks of all other threads for duration seconds."""
+    names = {}
+    counts = collections.Counter()
+    own = threading.get_ident()
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if ident not in names:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def write(counts, path):
+    temporary = path + ".tmp"
+    with open(temporary, 'w') as file:
+        for stack, count in counts.most_common():
+            file.write(f"{stack} {count}\n")
+    os.replace(temporary, path)
+
+
+def profile(duration=DURATION, folder=None):
+    """Sample for duration seconds and write the collapsed stacks, return the path."""
+    if not active.acquire(blocking=False):
+        return None
+    try:
+        folder = folder or profiles_dir()
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{os.getpid()}_{time.strftime('%Y-%m-%d_%H-%M-%S')}{SUFFIX}")
+        write(sample(duration), path)
+        return path
+    finally:
+        active.release()
+
+
+def handle(signum, frame):
+    """Signal handler: start a profile in the background, it never blocks."""
+    duration = DURATION
+    try:
+        with open(request_path(os.getpid()), 'r') as file:
+            duration = float(json.load(file)["duration"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    def run():
+        path = profile(duration)
+        if path is None:
+            return
+        write_private(request_path(os.getpid()), json.dumps({"duration": duration, "output": path}))
+    threading.Thread(target=run, name="profiler", daemon=True).start()
+
+
+def remove_pid_file(path):
+    if read_pid(path) == os.getpid():
+        os.remove(path)
+
+
+def install(command=None):
+    """Profile this process on PROFILE_SIGNAL. Only the handler is installed,
+    and the pid file of command, removed again at exit."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(PROFILE_SIGNAL, handle)
+    if command:
+        try:
+            path = pid_path(command)
+        except PermissionError as error:
+            print(f"Not profilable by name: {error}")
+            return
+        write_private(path, str(os.getpid()))
+        atexit.register(remove_pid_file, path)
+
+
+def request(pid, duration=DURATION):
+    """Ask process pid for a profile and wait for it, return its path."""
+    path = request_path(pid)
+    write_private(path, json.dumps({"duration": duration}))
+    os.kill(pid, PROFILE_SIGNAL)
+    end = time.monotonic() + duration + 10
+    while time.monotonic() < end:
+        time.sleep(0.5)
+        try:
+            with open(path, 'r') as file:
+                output = json.load(file).get("output")
+        except (OSError, ValueError):
+            output = None
+        if output:
+            os.remove(path)
+            return output
+    return None
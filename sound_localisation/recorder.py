@@ -0,0 +1,191 @@
+"""
+This code is used to let the raspberry pi continuesly stream data.
+
+It will check for the sound intensity in decibels, and when it is above a threshold variable it wil save the sample.
+
+it wil record as long as the variable max_sample_sec, with pre_trigger_sec before the trigger and post_trigger_sec
+after the sound dropped below the threshold.
+
+Every event is saved and localised once by a worker pool, away from the audio callback, so the CPU is only used when
+something happens. The direction, confidence and levels are stored next to the recording in a json file with the
+same name, and its envelope in a .env.npz file (see envelope.py).
+"""
+
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from . import audio as audio_device
+from . import codec
+from . import config
+from . import spl
+from .envelope import EnvelopeWriter
+from .localise import get_spl, process_window
+
+
+# variables to change
+THRESHOLD_DB = 100
+MAX_SAMPLE_SEC = 5
+PRE_TRIGGER_SEC = 0.5
+POST_TRIGGER_SEC = 0.5
+WORKERS = 1 # processes that save and localise events
+
+# declare variable used for streaming the audio.
+CHUNK = 1024 # frames to keep in buffer between reads, unless the devices command probed a better size
+CHANNELS = audio_device.CHANNELS # all microphones, so the events can be localised
+SAMPLE_WIDTH = 4 # bytes per sample, 32-bit stream
+
+
+def save_buffer(data, filename, channels=CHANNELS, sample_rate=audio_device.SAMPLE_RATE):
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b''.join(data))
+
+
+def process_event(filename, blocks, metadata, offset, localise=True, channels=CHANNELS):
+    """Save one event with its envelope and store its direction in filename with .json. Runs in the worker pool.
+    A .tsl filename is saved compressed (see codec.py)."""
+    if filename.endswith(codec.SUFFIX):
+        codec.save(blocks, filename, channels)
+    else:
+        save_buffer(blocks, filename, channels)
+    envelope = EnvelopeWriter(channels)
+    for block in blocks:
+        envelope.add(np.frombuffer(block, dtype=np.int32).reshape(-1, channels))
+    envelope.save(filename)
+    data = np.frombuffer(b''.join(blocks), dtype=np.int32).reshape(-1, channels)
+    metadata["spl"] = get_spl(data, offset).round(1).tolist()
+    if localise and channels >= 4:
+        phi, theta, confidence, _ = process_window(data.astype(np.float32), offset)
+        metadata["phi"] = round(float(np.rad2deg(phi)), 1)
+        metadata["theta"] = round(float(np.rad2deg(theta)), 1)
+        metadata["confidence"] = round(confidence, 3)
+    with open(os.path.splitext(filename)[0] + ".json", "w") as file:
+        json.dump(metadata, file, indent=4)
+    return filename, metadata
+
+
+class Recorder:
+    """Saves every stretch of audio above threshold_db to data_dir."""
+
+    def __init__(self, threshold_db=THRESHOLD_DB, max_sample_sec=MAX_SAMPLE_SEC, data_dir=None, settings=None,
+                 pre_trigger_sec=PRE_TRIGGER_SEC, post_trigger_sec=POST_TRIGGER_SEC, localise=True, workers=WORKERS,
+                 compress=False):
+        self.settings = settings or config.load()
+        self.offset = spl.offsets(self.settings, CHANNELS) # offset for decibel calculation, per channel
+        self.data_dir = data_dir or config.data_dir(self.settings)
+        self.threshold_db = threshold_db
+        self.max_sample_sec = max_sample_sec
+        self.pre_trigger_sec = pre_trigger_sec
+        self.post_trigger_sec = post_trigger_sec
+        self.localise = localise
+        self.workers = workers
+        self.suffix = codec.SUFFIX if compress else ".wav"
+        self.events = queue.Queue() # finished events, handed to the pool by run()
+        self.set_chunk(CHUNK)
+        self.count = 0
+        self.quiet = 0
+        self.peak = -np.inf
+        self.label = None
+
+    def set_chunk(self, chunk):
+        self.max_blocks = int(audio_device.SAMPLE_RATE / chunk * self.max_sample_sec)
+        self.post_blocks = int(np.ceil(audio_device.SAMPLE_RATE / chunk * self.post_trigger_sec))
+        self.pre_trigger = deque(maxlen=max(1, int(np.ceil(audio_device.SAMPLE_RATE / chunk * self.pre_trigger_sec))))
+        self.buffer = []
+
+    def callback(self, in_data, frame_count, time_info, status):
+        # Convert byte stream to int32 assuming 24-bit left-aligned in 32-bit words
+        audio_data = np.frombuffer(in_data, dtype=np.int32).reshape(-1, CHANNELS)
+
+        # Trigger if any mic goes over threshold
+        spl = get_spl(audio_data, self.offset).max()
+
+        if self.count == 0:
+            if spl > self.threshold_db:
+                self.label = datetime.datetime.now()
+                self.buffer = list(self.pre_trigger)
+                self.pre_trigger.clear()
+                self.count = 1
+                self.quiet = 0
+                self.peak = spl
+                self.buffer.append(in_data)
+            else:
+                self.pre_trigger.append(in_data)
+            return in_data, audio_device.PA_CONTINUE
+
+        self.buffer.append(in_data)
+        self.count += 1
+        self.peak = max(self.peak, spl)
+        self.quiet = 0 if spl > self.threshold_db else self.quiet + 1
+        if self.quiet > self.post_blocks or self.count >= self.max_blocks:
+            self.events.put((self.label, self.buffer, self.peak))
+            self.buffer = []
+            self.count = 0
+
+        return in_data, audio_device.PA_CONTINUE
+
+    def submit(self, pool, label, blocks, peak):
+        # Milliseconds, so events starting in the same second don't overwrite each other.
+        filename = os.path.join(self.data_dir, f"{label.strftime('%Y-%m-%d_%H-%M-%S-%f')[:-3]}{self.suffix}")
+        metadata = {"start": label.isoformat(),
+                    "duration": round(len(b''.join(blocks)) / (SAMPLE_WIDTH * CHANNELS * audio_device.SAMPLE_RATE), 3),
+                    "pre_trigger": self.pre_trigger_sec,
+                    "threshold_db": self.threshold_db,
+                    "peak_db": round(float(peak), 1)}
+        future = pool.submit(process_event, filename, blocks, metadata, self.offset, self.localise)
+        future.add_done_callback(self.report)
+
+    @staticmethod
+    def report(future):
+        try:
+            filename, metadata = future.result()
+        except Exception as error:
+            print(f"Saving an event failed: {error}")
+            return
+        direction = ""
+        if "phi" in metadata:
+            direction = f", phi {metadata['phi']:.1f} graden, theta {metadata['theta']:.1f} graden"
+        print(f"Saved {filename} at {metadata['peak_db']:.2f} dB{direction}")
+
+    def run(self):
+        """Stream until keyboard interrupt."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        audio = audio_device.open_audio()
+        _, chunk = audio_device.configured_device(audio, self.settings)
+        self.set_chunk(chunk or CHUNK)
+        # Workers are started by a fork server, not forked from this process once
+        # the PortAudio threads run; one is started now, so the first event doesn't wait.
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+        pool.submit(int).result()
+        stream = audio_device.open_input(audio, self.callback, channels=CHANNELS, frames_per_buffer=chunk or CHUNK)
+        stream.start_stream()
+
+        # Waiting for events with a timeout, so the raspberry pi doesn't overload
+        try:
+            while stream.is_active():
+                try:
+                    self.submit(pool, *self.events.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+        except KeyboardInterrupt:
+            print("Stopping the stream...")
+        finally:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+            if self.count > 0:
+                self.events.put((self.label, self.buffer, self.peak))
+                self.count = 0
+            while not self.events.empty():
+                self.submit(pool, *self.events.get_nowait())
+            pool.shutdown(wait=True)
+            print("Stream stopped and audio terminated successfully.")
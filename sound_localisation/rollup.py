@@ -0,0 +1,163 @@
+"""
+Per minute, hour and day summaries of the level and direction.
+
+The estimate stream of `demo --headless` is summarised in a fixed-size
+file per resolution in the rollups folder of the data folder. Every file
+is a ring of slots, one per interval, so it never grows: a slot is
+reused when its interval comes around again after RESOLUTIONS[name][1]
+intervals. A slot holds:
+
+    start   first second of the interval, 0 for an empty slot
+    energy  sum of 10^(L/10) of the estimates, for the Leq
+    count   estimates in the interval
+    lmax    highest level
+    events  times the level rose above the event threshold
+    sectors estimates per direction sector of 360 / SECTORS degrees
+
+The files are memory mapped numpy files, so a query over weeks reads a
+few hundred kB and is answered in milliseconds.
+"""
+
+import math
+import os
+import socket
+import time
+import numpy as np
+
+from . import config
+from . import stream
+
+
+# === Rollup Configuration ===
+RESOLUTIONS = {                 # name: (seconds per slot, slots kept)
+    "minute": (60, 14 * 24 * 60),
+    "hour": (3600, 400 * 24),
+    "day": (86400, 10 * 366),
+}
+SECTORS = 8
+EVENT_DB = 100                  # Level that counts as an event, like the recorder's threshold
+MIN_CONFIDENCE = 0.3            # Estimates below this don't count for the direction
+FLUSH_INTERVAL = 10.0           # Seconds between writes to the SD card
+
+SLOT = np.dtype([("start", "<i8"), ("energy", "<f8"), ("count", "<i4"), ("lmax", "<f4"),
+                 ("events", "<i4"), ("sectors", "<i4", (SECTORS,))])
+
+
+def rollup_dir(settings=None):
+    return os.path.join(config.data_dir(settings), "rollups")
+
+
+def sector_of(phi, heading=math.nan):
+    """Sector of an estimate: of the bearing to north with a compass heading,
+    of phi relative to the array without."""
+    degrees = math.degrees(phi)
+    if not math.isnan(heading):
+        degrees = heading - degrees
+    return int(degrees % 360 // (360 / SECTORS))
+
+
+class Rollup:
+    """The ring file of one resolution."""
+
+    def __init__(self, path, seconds, slots):
+        self.seconds = seconds
+        if os.path.exists(path):
+            self.slots = np.load(path, mmap_mode='r+')
+            if self.slots.dtype != SLOT or len(self.slots) != slots:
+                raise ValueError(f"{path} has another layout, move it away to start a new one")
+        else:
+            self.slots = np.lib.format.open_memmap(path, mode='w+', dtype=SLOT, shape=(slots,))
+
+    def slot(self, timestamp):
+        """Index of the slot of timestamp, cleared when it held an older interval."""
+        start = int(timestamp // self.seconds * self.seconds)
+        index = start // self.seconds % len(self.slots)
+        if self.slots["start"][index] != start:
+            self.slots[index] = np.zeros((), dtype=SLOT)
+            self.slots["start"][index] = start
+        return index
+
+    def add(self, timestamp, level, sector=None, event=False):
+        index = self.slot(timestamp)
+        slots = self.slots
+        first = slots["count"][index] == 0
+        slots["energy"][index] += 10 ** (level / 10)
+        slots["count"][index] += 1
+        slots["lmax"][index] = level if first else max(slots["lmax"][index], level)
+        slots["events"][index] += event
+        if sector is not None:
+            slots["sectors"][index, sector] += 1
+
+    def query(self, start, end):
+        """Summaries of the intervals that start between start and end seconds,
+        oldest first, as a dict of arrays."""
+        slots = self.slots[(self.slots["start"] >= start) & (self.slots["start"] < end) & (self.slots["count"] > 0)]
+        slots = slots[np.argsort(slots["start"])]
+        directions = slots["sectors"].sum(axis=1) > 0
+        return {"start": slots["start"],
+                "leq": 10 * np.log10(slots["energy"] / slots["count"]),
+                "lmax": slots["lmax"].astype(np.float64),
+                "events": slots["events"],
+                "estimates": slots["count"],
+                "sector": np.where(directions, np.argmax(slots["sectors"], axis=1), -1)}
+
+    def flush(self):
+        self.slots.flush()
+
+
+class RollupStore:
+    """One Rollup per resolution, fed with the estimates."""
+
+    def __init__(self, folder=None, event_db=EVENT_DB):
+        self.folder = folder or rollup_dir()
+        os.makedirs(self.folder, exist_ok=True)
+        self.rollups = {name: Rollup(os.path.join(self.folder, f"{name}.npy"), seconds, slots)
+                        for name, (seconds, slots) in RESOLUTIONS.items()}
+        self.event_db = event_db
+        self.loud = False
+
+    def add(self, timestamp, spl, phi, confidence, heading=math.nan):
+        """Add one estimate, spl per channel in dB."""
+        level = 10 * math.log10(np.mean(np.power(10, np.asarray(spl) / 10)))
+        sector = sector_of(phi, heading) if confidence >= MIN_CONFIDENCE else None
+        event = level > self.event_db and not self.loud
+        self.loud = level > self.event_db
+        for rollup in self.rollups.values():
+            rollup.add(timestamp, level, sector, event)
+
+    def query(self, resolution, start, end=None):
+        return self.rollups[resolution].query(start, time.time() if end is None else end)
+
+    def flush(self):
+        for rollup in self.rollups.values():
+            rollup.flush()
+
+
+def run(address=(stream.DEFAULT_HOST, stream.DEFAULT_PORT), family=socket.AF_INET, folder=None):
+    """Add the estimates of a running publisher to the rollups until interrupted."""
+    store = RollupStore(folder)
+    subscriber = stream.EstimateSubscriber(address, family)
+    last_flush = time.monotonic()
+    try:
+        for estimate in subscriber:
+            store.add(estimate.timestamp, estimate.spl, estimate.phi, estimate.confidence, estimate.heading)
+            if time.monotonic() - last_flush > FLUSH_INTERVAL:
+                store.flush()
+                last_flush = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
+        store.flush()
+
+
+def show(resolution="hour", days=1.0, folder=None):
+    """Print the summaries of the last days."""
+    store = RollupStore(folder)
+    summary = store.query(resolution, time.time() - days * 86400)
+    print("start                 Leq    Lmax  events  sector")
+    for i in range(len(summary["start"])):
+        start = time.strftime("%Y-%m-%d %H:%M", time.localtime(summary["start"][i]))
+        sector = summary["sector"][i]
+        direction = f"{sector * 360 / SECTORS:.0f}-{(sector + 1) * 360 / SECTORS:.0f}" if sector >= 0 else "-"
+        print(f"{start}  {summary['leq'][i]:6.1f}  {summary['lmax'][i]:6.1f}  {summary['events'][i]:6d}  {direction}")
@@ -0,0 +1,240 @@
+"""
+Memory soak test: days of audio through the real services in hours.
+
+A take (the synthetic one of benchmark.py, or a recording) is replayed in
+a loop, block by block, into the callbacks of the recorder and the demo
+pipeline, as fast as they keep up or at --speed times real time. The
+recorder's threshold is set just below the loudest blocks of the take,
+so about EVENTS_PER_HOUR events of audio are triggered, a busy day at
+the plant rather than an event every second. They are written by a
+thread in this process (instead of the worker processes) so their memory
+is measured too; the event files are deleted after every snapshot.
+
+Every SNAPSHOT_MINUTES of audio a tracemalloc snapshot and the RSS are
+taken. The report lists the allocation sites that grew most since the
+end of the warm up, and the trend of the RSS and the traced memory in MB per day of
+audio over the snapshots after the warm up: at least WARM_UP_HOURS of
+audio, so the allocator and the caches filling up don't count as a leak
+in short runs. The snapshots are written to soak.csv in the output
+folder, with the events of the recorder and the estimates of the demo,
+a row as soon as it is taken. SIGTERM stops the soak like Ctrl+C: the
+snapshots so far are reported.
+"""
+
+import csv
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+from . import spl
+from .benchmark import blocks_of, load_input, synthetic
+
+
+# === Soak Configuration ===
+SIMULATED_HOURS = 168       # Audio replayed, a week
+SNAPSHOT_MINUTES = 60       # Audio between snapshots
+WARM_UP = 0.1               # Part of the snapshots before growth is measured
+WARM_UP_HOURS = 2           # Audio before growth is measured, at least
+MIN_SNAPSHOTS = 4           # Snapshots after the warm up needed for a trend
+TREND_LIMIT_MB = 1.0        # MB per day of audio that counts as a leak
+EVENTS_PER_HOUR = 60        # Recorder events per hour of audio
+TOP_SITES = 10
+SERVICES = ["record", "demo"]
+FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__),     # The snapshots themselves
+           tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+
+
+def rss_mb():
+    """Current resident set size."""
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def trend(hours, values):
+    """Slope per day: the median of the slopes between all pairs of snapshots
+    (Theil-Sen), so a single snapshot taken while an event was in flight
+    doesn't look like growth."""
+    hours, values = np.asarray(hours, dtype=float), np.asarray(values, dtype=float)
+    i, j = np.triu_indices(len(hours), k=1)
+    if not len(i):
+        return 0.0
+    return float(np.median((values[j] - values[i]) / (hours[j] - hours[i]))) * 24
+
+
+class RecorderService:
+    """The recorder callback, with the events saved in this process."""
+
+    def __init__(self, take, settings, folder, events_per_hour=EVENTS_PER_HOUR):
+        from .recorder import Recorder
+
+        offset = spl.offsets(settings, take.shape[1])
+        levels = np.sort([spl.leq(np.frombuffer(block, dtype=np.int32).reshape(-1, take.shape[1]), offset).max()
+                          for block in blocks_of(take)])
+        # Just below the loudest blocks, as many as trigger events_per_hour while the take loops.
+        take_hours = len(take) / audio_device.SAMPLE_RATE / 3600
+        loud = int(np.clip(round(events_per_hour * take_hours), 1, len(levels)))
+        self.folder = folder
+        self.recorder = Recorder(threshold_db=float(levels[-loud]) - 0.01, data_dir=folder, settings=settings)
+        self.recorder.set_chunk(audio_device.CHUNK)
+        self.recorder.report = lambda future: future.result()    # Raise errors, don't print every event
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.count = 0
+        self.column = "recorder_events"
+
+    def feed(self, block):
+        self.recorder.callback(block, audio_device.CHUNK, None, 0)
+        while not self.recorder.events.empty():
+            self.recorder.submit(self.pool, *self.recorder.events.get_nowait())
+            self.count += 1
+
+    def clean(self):
+        """Wait for the pending events and delete their files."""
+        self.pool.submit(time.sleep, 0).result()
+        for entry in os.scandir(self.folder):
+            os.remove(entry.path)
+
+    def stop(self):
+        self.pool.shutdown(wait=True)
+
+
+class DemoService:
+    """The demo pipeline, with its estimates taken like the dial does."""
+
+    def __init__(self, take, settings, folder):
+        from .pipeline import Pipeline
+
+        self.pipeline = Pipeline(None, settings=settings)
+        self.pipeline.running.set()
+        self.worker = threading.Thread(target=self.pipeline.run, daemon=True)
+        self.worker.start()
+        self.count = 0
+        self.column = "demo_estimates"
+
+    def feed(self, block):
+        self.pipeline.callback(block, audio_device.CHUNK, None, 0)
+        # The worker may merge blocks, but it shouldn't fall behind more than a few.
+        while self.pipeline.blocks.qsize() > 2:
+            time.sleep(1e-3)
+        if not self.pipeline.results.empty():
+            self.count += len(self.pipeline.drain())
+
+    def clean(self):
+        pass
+
+    def stop(self):
+        self.pipeline.blocks.put(None)
+        self.worker.join()
+        os.close(self.pipeline.wake_r)
+        os.close(self.pipeline.wake_w)
+
+
+SERVICE_CLASSES = {"record": RecorderService, "demo": DemoService}
+
+
+def run(recording=None, services=None, hours=SIMULATED_HOURS, speed=0, snapshot_minutes=SNAPSHOT_MINUTES,
+        output="soak"):
+    """Replay hours of audio into the services, at speed times real time (0 is
+    as fast as possible). Returns 1 when the RSS trends upwards."""
+    settings = config.load()
+    take = load_input(recording) if recording else synthetic(60)
+    blocks = blocks_of(take)
+    block_sec = audio_device.CHUNK / audio_device.SAMPLE_RATE
+    total = int(hours * 3600 / block_sec)
+    per_snapshot = max(1, int(snapshot_minutes * 60 / block_sec))
+    os.makedirs(output, exist_ok=True)
+    folder = tempfile.mkdtemp(prefix="soak_")
+
+    tracemalloc.start()
+    running = [SERVICE_CLASSES[name](take, settings, folder) for name in services or SERVICES]
+    # Only the snapshot at the end of the warm up and the last one are kept,
+    # every snapshot held would add to the RSS that is measured.
+    # The snapshot at the end of the warm up is the baseline and the first of the trend.
+    warm_up = max(int(-(-total // per_snapshot) * WARM_UP), int(np.ceil(WARM_UP_HOURS * 60 / snapshot_minutes)) - 1)
+    baseline = None
+    snapshot = None
+    rows = []
+    results = open(os.path.join(output, "soak.csv"), 'w', newline='')
+    writer = None
+    terminate = None
+    if threading.current_thread() is threading.main_thread():
+        terminate = signal.signal(signal.SIGTERM, stop_on_signal)
+    print(f"Replaying {hours:.0f} hours of audio into {', '.join(services or SERVICES)}...")
+    started = time.monotonic()
+    try:
+        for count in range(total):
+            block = blocks[count % len(blocks)]
+            for service in running:
+                service.feed(block)
+            if speed:
+                delay = started + (count + 1) * block_sec / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if (count + 1) % per_snapshot == 0 or count + 1 == total:
+                for service in running:
+                    service.clean()
+                simulated = (count + 1) * block_sec / 3600
+                snapshot = tracemalloc.take_snapshot().filter_traces(FILTERS)
+                if len(rows) == warm_up:
+                    baseline = snapshot
+                traced, _ = tracemalloc.get_traced_memory()
+                rows.append({"hours": round(simulated, 3), "rss_mb": round(rss_mb(), 2),
+                             "traced_mb": round(traced / 1e6, 3),
+                             **{service.column: service.count for service in running},
+                             "speed": round(simulated * 3600 / (time.monotonic() - started), 1)})
+                print(", ".join(f"{key} {value}" for key, value in rows[-1].items()))
+                if writer is None:
+                    writer = csv.DictWriter(results, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                writer.writerow(rows[-1])
+                results.flush()
+    except KeyboardInterrupt:
+        print("Stopped, reporting the snapshots so far.")
+    finally:
+        if terminate is not None:
+            signal.signal(signal.SIGTERM, terminate)
+        results.close()
+        for service in running:
+            service.stop()
+        tracemalloc.stop()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return report(baseline, snapshot, rows[warm_up:])
+
+
+def stop_on_signal(signum, frame):
+    """SIGTERM handler: stop like Ctrl+C, so the soak still reports."""
+    raise KeyboardInterrupt
+
+
+def report(baseline, snapshot, rows):
+    if len(rows) < MIN_SNAPSHOTS:
+        print(f"Too few snapshots after the warm up of {WARM_UP_HOURS} hours for a trend, "
+              "replay more hours or take them more often.")
+        return 0
+    hours = [row["hours"] for row in rows]
+    rss_trend = trend(hours, [row["rss_mb"] for row in rows])
+    traced_trend = trend(hours, [row["traced_mb"] for row in rows])
+
+    print(f"\nGrowth since {hours[0]:.1f} hours of audio, by allocation site:")
+    growth = snapshot.compare_to(baseline, "lineno")
+    for stat in [stat for stat in growth if stat.size_diff > 0][:TOP_SITES]:
+        print(f"  {stat.size_diff / 1e3:+10.1f} kB {stat.count_diff:+7d} blocks  {stat.traceback}")
+    print(f"RSS {rss_trend:+.2f} MB per day of audio, traced {traced_trend:+.2f} MB per day")
+    if rss_trend > TREND_LIMIT_MB or traced_trend > TREND_LIMIT_MB:
+        print(f"Upward trend: more than {TREND_LIMIT_MB} MB per day.")
+        return 1
+    print("No upward trend.")
+    return 0
@@ -0,0 +1,123 @@
+"""
+Sound pressure level of int32 blocks, the one level calculation of the
+package.
+
+Levels are offset + 20*log10(rms), with rms on the 2**31 full scale and
+offset the dB SPL at digital full scale from variables.json: one value for
+all channels, or a list with one per channel. SPLMeter adds frequency
+weighting (Z, A or C, IEC 61672) and time weighting (fast 125 ms, slow
+1 s), keeping the filter states between blocks, and takes one
+(frames, channels) block or a (blocks, frames, channels) stack of
+consecutive blocks at once.
+"""
+
+import numpy as np
+
+from . import audio as audio_device
+
+
+TIME_CONSTANTS = {"fast": 0.125, "slow": 1.0}
+FLOOR = 1e-12           # Added to the rms, so silence gives a finite level
+
+
+def offsets(settings, channels):
+    """Per-channel calibration offsets from the settings."""
+    return np.broadcast_to(np.asarray(settings["offset"], dtype=np.float64), (channels,))
+
+
+def sum_of_squares(block):
+    """Sum of the squared samples per channel over the frames axis, in float64
+    without a squared copy of the block."""
+    block = np.asarray(block)
+    subscripts = "...ij,...ij->...j"
+    return np.einsum(subscripts, block, block, dtype=np.float64, casting="unsafe")
+
+
+def from_mean_square(mean_square, offset):
+    """Level of a mean square on the full scale (1.0 is full scale)."""
+    return np.asarray(offset, dtype=np.float64) + 20 * np.log10(np.sqrt(np.maximum(mean_square, 0)) + FLOOR)
+
+
+def leq_from_sums(sums, frames, offset):
+    """Equivalent level of sum_of_squares() of frames int32-scaled samples, for
+    callers that keep the sums up to date themselves."""
+    return from_mean_square(np.asarray(sums) / max(frames, 1) / 2.0**62, offset)
+
+
+def leq(block, offset):
+    """Equivalent level per channel of an int32 (or int32-scaled) block, or of
+    every block of a (blocks, frames, channels) stack."""
+    return leq_from_sums(sum_of_squares(block), np.shape(block)[-2], offset)
+
+
+def weighting_sos(weighting, rate=audio_device.SAMPLE_RATE):
+    """Second order sections of the A or C weighting filter, 0 dB at 1 kHz."""
+    from scipy.signal import bilinear_zpk, sosfreqz, zpk2sos
+
+    # Pole frequencies of IEC 61672
+    f1, f2, f3, f4 = 20.598997, 107.65265, 737.86223, 12194.217
+    w = [2 * np.pi * f for f in (f1, f2, f3, f4)]
+    if weighting == "A":
+        zeros, poles = [0] * 4, [-w[0], -w[0], -w[1], -w[2], -w[3], -w[3]]
+    elif weighting == "C":
+        zeros, poles = [0] * 2, [-w[0], -w[0], -w[3], -w[3]]
+    else:
+        raise ValueError(f"unknown weighting {weighting}")
+    z, p, k = bilinear_zpk(zeros, poles, 1.0, rate)
+    sos = zpk2sos(z, p, k)
+    _, response = sosfreqz(sos, worN=[1000], fs=rate)
+    sos[0, :3] /= abs(response[0])
+    return sos
+
+
+class SPLMeter:
+    """Calibrated, weighted level meter for consecutive int32 blocks."""
+
+    def __init__(self, offset, channels=audio_device.CHANNELS, rate=audio_device.SAMPLE_RATE, weighting="Z",
+                 time_weighting=None):
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), (channels,))
+        self.channels = channels
+        self.rate = rate
+        self.weighting = weighting.upper()
+        self.sos = None
+        self.zi = None
+        if self.weighting != "Z":
+            self.sos = weighting_sos(self.weighting, rate)
+            self.zi = np.zeros((len(self.sos), 2, channels))
+        self.time_weighting = time_weighting
+        self.mean_square = np.zeros(channels)       # State of the time weighting, full scale squared
+        self.lmax = np.full(channels, -np.inf)      # Highest time weighted level since reset()
+
+    def reset(self):
+        self.mean_square[:] = 0
+        self.lmax[:] = -np.inf
+        if self.zi is not None:
+            self.zi[:] = 0
+
+    def __call__(self, block):
+        """Levels per channel: the Leq of the block without time weighting, else
+        the time weighted level at the end of the block. A (blocks, frames,
+        channels) stack gives (blocks, channels)."""
+        from scipy.signal import lfilter, sosfilt
+
+        block = np.asarray(block)
+        stacked = block.ndim == 3
+        frames = block.shape[-2]
+        if self.sos is None and self.time_weighting is None:
+            return leq(block, self.offset)
+
+        # Consecutive blocks are one signal for the filters.
+        data = block.reshape(-1, self.channels) / 2**31
+        if self.sos is not None:
+            data, self.zi = sosfilt(self.sos, data, axis=0, zi=self.zi)
+        if self.time_weighting is None:
+            return from_mean_square(sum_of_squares(data.reshape(block.shape)) / frames, self.offset)
+
+        alpha = 1 - np.exp(-1 / (TIME_CONSTANTS[self.time_weighting] * self.rate))
+        squared = np.square(data, out=data)
+        averaged, zi = lfilter([alpha], [1, alpha - 1], squared, axis=0, zi=(1 - alpha) * self.mean_square[None])
+        self.mean_square = zi[0] / (1 - alpha)
+        levels = self.offset + 10 * np.log10(averaged + FLOOR ** 2)
+        self.lmax = np.maximum(self.lmax, levels.max(axis=0))
+        ends = levels[frames - 1::frames]
+        return ends if stacked else ends[0]
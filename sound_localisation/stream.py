@@ -0,0 +1,264 @@
+"""
+Publishes direction estimates as compact binary records over a local
+datagram socket (UDP on localhost or a Unix domain socket).
+
+Subscribers register by sending b"SUB" to the publisher and have to repeat
+that at least every SUBSCRIBER_TIMEOUT seconds, b"UNSUB" removes them
+straight away. Every subscriber has its own bounded queue: records that
+pile up while a client is slow are sent together in one datagram, and when
+the queue is full the oldest records are dropped for that client only.
+publish() never blocks, so the audio pipeline can't be stalled by a client.
+
+Datagram layout (little endian):
+    header: magic b"TSE1", version (u8), channels (u8), record count (u16)
+    record: timestamp (f64), phi (f32), theta (f32), confidence (f32),
+            heading (f32, nan without compass or a recent compass reading),
+            channels x SPL (f32)
+
+`python -m sound_localisation stream` prints the records of a running
+publisher as JSON lines.
+"""
+
+import collections
+import itertools
+import json
+import math
+import os
+import select
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+
+# === Stream Configuration ===
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 50505
+MAX_PENDING = 256           # Records queued per subscriber before dropping
+BATCH_SIZE = 32             # Records per datagram at most
+SUBSCRIBER_TIMEOUT = 10.0   # Seconds without a b"SUB" before a subscriber is removed
+RENEW_INTERVAL = 2.0        # Seconds between b"SUB" renewals of a subscriber
+
+MAGIC = b"TSE1"
+VERSION = 2
+HEADER = struct.Struct("<4sBBH")
+RECORD = struct.Struct("<dffff")
+
+Estimate = collections.namedtuple("Estimate", "timestamp phi theta confidence heading spl")
+
+
+def pack_record(timestamp, phi, theta, confidence, spl, heading=math.nan):
+    """Pack one estimate, spl holds one level per channel."""
+    return RECORD.pack(timestamp, phi, theta, confidence, heading) + struct.pack(f"<{len(spl)}f", *spl)
+
+
+def pack_datagram(records, channels):
+    return HEADER.pack(MAGIC, VERSION, channels, len(records)) + b"".join(records)
+
+
+def unpack_datagram(data):
+    """Return the list of Estimate records in one datagram."""
+    magic, version, channels, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not an estimate stream datagram")
+    spl_format = struct.Struct(f"<{channels}f")
+    size = RECORD.size + spl_format.size
+    estimates = []
+    for offset in range(HEADER.size, HEADER.size + count * size, size):
+        timestamp, phi, theta, confidence, heading = RECORD.unpack_from(data, offset)
+        spl = spl_format.unpack_from(data, offset + RECORD.size)
+        estimates.append(Estimate(timestamp, phi, theta, confidence, heading, spl))
+    return estimates
+
+
+def make_socket(address, family):
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    if family == socket.AF_UNIX and os.path.exists(address):
+        os.unlink(address)
+    sock.bind(address)
+    sock.setblocking(False)
+    return sock
+
+
+class EstimatePublisher:
+    """Fan estimates out to every registered subscriber from a sender thread."""
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), family=socket.AF_INET,
+                 max_pending=MAX_PENDING, batch_size=BATCH_SIZE):
+        self.address = address
+        self.family = family
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.subscribers = {}   # address -> [last seen, deque of packed records]
+        self.channels = 0
+        self.dropped = collections.Counter()
+        self.lock = threading.Lock()
+        self.sock = None
+        self.thread = None
+        self.running = threading.Event()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_w, False)
+
+    def start(self):
+        self.sock = make_socket(self.address, self.family)
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.wakeup()
+        self.thread.join()
+        self.sock.close()
+        if self.family == socket.AF_UNIX:
+            os.unlink(self.address)
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def wakeup(self):
+        try:
+            os.write(self.wake_w, b".")
+        except BlockingIOError:
+            pass  # Sender is already due to wake up
+
+    def publish(self, timestamp, phi, theta, confidence, spl, heading=math.nan):
+        record = pack_record(timestamp, phi, theta, confidence, spl, heading)
+        with self.lock:
+            self.channels = len(spl)
+            for subscriber, (_, pending) in self.subscribers.items():
+                if len(pending) == pending.maxlen:
+                    self.dropped[subscriber] += 1
+                pending.append(record)
+        self.wakeup()
+
+    def run(self):
+        while self.running.is_set():
+            ready, _, _ = select.select([self.sock, self.wake_r], [], [], RENEW_INTERVAL)
+            if self.wake_r in ready:
+                os.read(self.wake_r, 4096)
+            if self.sock in ready:
+                self.handle_requests()
+            self.expire_subscribers()
+            self.flush()
+
+    def handle_requests(self):
+        while True:
+            try:
+                request, subscriber = self.sock.recvfrom(64)
+            except (BlockingIOError, InterruptedError):
+                return
+            if not subscriber:
+                continue  # Unbound Unix socket, there is nowhere to reply to
+            with self.lock:
+                if request.startswith(b"UNSUB"):
+                    self.subscribers.pop(subscriber, None)
+                elif request.startswith(b"SUB"):
+                    if subscriber in self.subscribers:
+                        self.subscribers[subscriber][0] = time.monotonic()
+                    else:
+                        pending = collections.deque(maxlen=self.max_pending)
+                        self.subscribers[subscriber] = [time.monotonic(), pending]
+
+    def expire_subscribers(self):
+        deadline = time.monotonic() - SUBSCRIBER_TIMEOUT
+        with self.lock:
+            for subscriber in [s for s, (seen, _) in self.subscribers.items() if seen < deadline]:
+                del self.subscribers[subscriber]
+
+    def flush(self):
+        with self.lock:
+            subscribers = list(self.subscribers.items())
+        for subscriber, (_, pending) in subscribers:
+            while pending:
+                with self.lock:
+                    batch = list(itertools.islice(pending, self.batch_size))
+                try:
+                    self.sock.sendto(pack_datagram(batch, self.channels), subscriber)
+                except (BlockingIOError, InterruptedError):
+                    break  # Client is slow, keep batching until its socket drains
+                except (ConnectionRefusedError, FileNotFoundError):
+                    with self.lock:
+                        self.subscribers.pop(subscriber, None)
+                    break
+                with self.lock:
+                    # publish() may have dropped some of these meanwhile,
+                    # only remove the records that are still queued.
+                    for record in batch:
+                        if pending and pending[0] is record:
+                            pending.popleft()
+
+
+class EstimateSubscriber:
+    """Iterate over the estimates of a publisher, renewing the subscription."""
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), family=socket.AF_INET):
+        self.address = address
+        self.family = family
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.local_path = None
+        if family == socket.AF_UNIX:
+            self.local_path = os.path.join(tempfile.gettempdir(), f"estimate-sub-{os.getpid()}-{id(self)}.sock")
+            self.sock.bind(self.local_path)
+        self.last_renew = 0.0
+
+    def renew(self):
+        self.sock.sendto(b"SUB", self.address)
+        self.last_renew = time.monotonic()
+
+    def receive(self, timeout=RENEW_INTERVAL):
+        """Return the estimates that arrived within timeout seconds."""
+        if time.monotonic() - self.last_renew >= RENEW_INTERVAL:
+            self.renew()
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = self.sock.recv(65536)
+        except ConnectionRefusedError:
+            return []  # Publisher not running (yet), keep renewing
+        return unpack_datagram(data)
+
+    def __iter__(self):
+        while True:
+            yield from self.receive()
+
+    def close(self):
+        try:
+            self.sock.sendto(b"UNSUB", self.address)
+        except OSError:
+            pass
+        self.sock.close()
+        if self.local_path is not None:
+            os.unlink(self.local_path)
+
+
+def parse_address(args):
+    if args.socket:
+        return args.socket, socket.AF_UNIX
+    return (args.host, args.port), socket.AF_INET
+
+
+def add_address_arguments(parser):
+    parser.add_argument("--host", default=DEFAULT_HOST, help="UDP host of the estimate stream")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port of the estimate stream")
+    parser.add_argument("--socket", help="Unix domain socket path, used instead of UDP")
+
+
+def to_json(estimate):
+    """The estimate as a dict for JSON: a missing value (NaN, like the heading
+    without a compass) becomes null, since NaN isn't valid JSON."""
+    return {key: value if math.isfinite(value) else None
+            for key, value in estimate._asdict().items()}
+
+
+def print_stream(address=(DEFAULT_HOST, DEFAULT_PORT), family=socket.AF_INET):
+    """Print every received estimate as a JSON line until interrupted."""
+    subscriber = EstimateSubscriber(address, family)
+    try:
+        for estimate in subscriber:
+            print(json.dumps(to_json(estimate), allow_nan=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
@@ -0,0 +1,221 @@
+"""
+Measurement sweeps described by a JSON file instead of a script.
+
+A sweep file lists the set-points and what to measure at each of them:
+
+    {"measurement": "direction",    # or "level"
+     "samples": 25,                 # windows measured per set-point
+     "window": 1.0,                 # seconds per window
+     "channels": 4,
+     "grid": {"theta": [90, 60], "phi": [0, 45, 90]},
+     "ask": ["reference_db"]}
+
+Set-points are either listed under "setpoints" (a list of objects) or
+given as a "grid", which expands to every combination. Before every
+set-point the operator is told its values and asked for the keys in
+"ask" (for example the dB reading of the reference meter). "direction"
+compares phi/theta with the "phi"/"theta" of the set-point, "level"
+measures the level per channel, optionally A or C weighted ("weighting": "A")
+or band filtered ("band": [50, 5000]).
+
+Every window is measured straight into a preallocated array and each
+completed set-point is appended to results.csv in the output folder. When
+a sweep is started again with the same output folder, the completed
+set-points are skipped, so an interrupted session continues where it
+stopped.
+"""
+
+import csv
+import itertools
+import json
+import os
+import queue
+import numpy as np
+
+from . import audio as audio_device
+from . import config
+from . import spl
+from .localise import process_window
+
+
+RESULTS_FILE = "results.csv"
+DEFINITION_FILE = "sweep.json"
+
+
+def load_sweep(path):
+    with open(path, 'r') as file:
+        sweep = json.load(file)
+    sweep.setdefault("samples", 25)
+    sweep.setdefault("window", 1.0)
+    sweep.setdefault("channels", audio_device.CHANNELS)
+    sweep.setdefault("ask", [])
+    return sweep
+
+
+def setpoints(sweep):
+    """Return the list of set-points of a sweep, in measuring order."""
+    if "setpoints" in sweep:
+        return [dict(setpoint) for setpoint in sweep["setpoints"]]
+    keys = list(sweep["grid"])
+    return [dict(zip(keys, values)) for values in itertools.product(*(sweep["grid"][k] for k in keys))]
+
+
+def wrap_degrees(angle):
+    return (angle + 180) % 360 - 180
+
+
+class DirectionMeasurement:
+    """phi and theta in degrees and their error against the set-point."""
+
+    def __init__(self, sweep, settings):
+        self.offset = settings["offset"]
+        self.fields = ["measured_phi", "measured_theta", "confidence", "phi_error", "theta_error"]
+
+    def __call__(self, window, setpoint, out):
+        phi, theta, confidence, _ = process_window(window, self.offset)
+        out[0] = np.rad2deg(phi)
+        out[1] = np.rad2deg(theta)
+        out[2] = confidence
+        out[3] = wrap_degrees(out[0] - setpoint.get("phi", np.nan))
+        out[4] = out[1] - setpoint.get("theta", np.nan)
+
+
+class LevelMeasurement:
+    """Level per channel in dB full scale and dB SPL (with the configured offset)."""
+
+    def __init__(self, sweep, settings):
+        from scipy.signal import butter
+
+        channels = sweep["channels"]
+        self.offset = spl.offsets(settings, channels)
+        self.meter = spl.SPLMeter(0.0, channels, weighting=sweep.get("weighting", "Z"))
+        self.band = None
+        if "band" in sweep:
+            self.band = butter(6, sweep["band"], btype='bandpass', fs=audio_device.SAMPLE_RATE, output='sos')
+        self.fields = [f"dbfs_{ch}" for ch in range(channels)] + [f"spl_{ch}" for ch in range(channels)]
+
+    def __call__(self, window, setpoint, out):
+        from scipy.signal import sosfilt
+
+        if self.band is not None:
+            window = sosfilt(self.band, window, axis=0)
+        # Every window is measured on its own.
+        self.meter.reset()
+        channels = window.shape[1]
+        out[:channels] = self.meter(window)
+        out[channels:] = out[:channels] + self.offset
+
+
+MEASUREMENTS = {"direction": DirectionMeasurement, "level": LevelMeasurement}
+
+
+class Capture:
+    """One input stream, read window by window between set-points."""
+
+    def __init__(self, audio, channels):
+        self.channels = channels
+        self.blocks = queue.Queue()
+        self.leftover = np.zeros((0, channels), dtype=np.int32)
+        self.stream = audio_device.open_input(audio, self.callback, channels=channels)
+        self.stream.stop_stream()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        self.blocks.put_nowait(in_data)
+        return (None, audio_device.PA_CONTINUE)
+
+    def start(self):
+        # Throw away what was captured while the set-up was changed.
+        while not self.blocks.empty():
+            self.blocks.get_nowait()
+        self.leftover = self.leftover[:0]
+        self.stream.start_stream()
+
+    def stop(self):
+        self.stream.stop_stream()
+
+    def close(self):
+        self.stream.close()
+
+    def read(self, out):
+        """Fill out (frames, channels) with the next frames of the stream."""
+        filled = min(len(self.leftover), len(out))
+        out[:filled] = self.leftover[:filled]
+        self.leftover = self.leftover[filled:]
+        while filled < len(out):
+            block = np.frombuffer(self.blocks.get(), dtype=np.int32).reshape(-1, self.channels)
+            take = min(len(block), len(out) - filled)
+            out[filled:filled + take] = block[:take]
+            self.leftover = block[take:]
+            filled += take
+        return out
+
+
+def completed_setpoints(path):
+    """Indices of the set-points already in results.csv."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as file:
+        return {int(row["setpoint"]) for row in csv.DictReader(file)}
+
+
+def run(sweep_path, output):
+    """Measure every set-point of the sweep that isn't in output yet."""
+    sweep = load_sweep(sweep_path)
+    points = setpoints(sweep)
+    settings = config.load()
+    measurement = MEASUREMENTS[sweep["measurement"]](sweep, settings)
+
+    os.makedirs(output, exist_ok=True)
+    definition = os.path.join(output, DEFINITION_FILE)
+    if os.path.exists(definition):
+        with open(definition, 'r') as file:
+            if json.load(file) != sweep:
+                raise SystemExit(f"{output} holds a different sweep, choose another output folder.")
+    else:
+        with open(definition, 'w') as file:
+            json.dump(sweep, file, indent=4)
+
+    results_path = os.path.join(output, RESULTS_FILE)
+    done = completed_setpoints(results_path)
+    keys = list(dict.fromkeys(itertools.chain(*(point.keys() for point in points), sweep["ask"])))
+    header = ["setpoint", "sample", *keys, *measurement.fields]
+    if not os.path.exists(results_path):
+        with open(results_path, 'w', newline='') as file:
+            csv.writer(file).writerow(header)
+    if done:
+        print(f"Resuming, {len(done)} of {len(points)} set-points are done.")
+
+    frames = int(sweep["window"] * audio_device.SAMPLE_RATE)
+    window = np.zeros((frames, sweep["channels"]), dtype=np.int32)
+    results = np.full((sweep["samples"], len(measurement.fields)), np.nan)
+
+    audio = audio_device.open_audio()
+    capture = Capture(audio, sweep["channels"])
+    try:
+        for index, setpoint in enumerate(points):
+            if index in done:
+                continue
+            described = ", ".join(f"{k} {v}" for k, v in setpoint.items())
+            input(f"\n[{index + 1}/{len(points)}] Set up {described} and press Enter...")
+            for key in sweep["ask"]:
+                setpoint[key] = float(input(f"{key}: "))
+
+            results.fill(np.nan)
+            capture.start()
+            for sample in range(sweep["samples"]):
+                capture.read(window)
+                measurement(window, setpoint, results[sample])
+                print(f"[{index + 1}/{len(points)}] sample {sample + 1}: "
+                      + ", ".join(f"{f} {v:.2f}" for f, v in zip(measurement.fields, results[sample])))
+            capture.stop()
+
+            with open(results_path, 'a', newline='') as file:
+                writer = csv.writer(file)
+                for sample, row in enumerate(results):
+                    writer.writerow([index, sample, *(setpoint.get(k, "") for k in keys), *row.tolist()])
+    except KeyboardInterrupt:
+        print("\nMeasurement interrupted, start the same sweep again to continue.")
+    finally:
+        capture.close()
+        audio.terminate()
+    print(f"Results saved in {results_path}")
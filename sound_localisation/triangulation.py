@@ -0,0 +1,290 @@
+"""
+Combines the bearings of several arrays into source positions.
+
+Every node runs `python -m sound_localisation demo --headless --host 0.0.0.0`
+and is described in a JSON config (see nodes.json):
+
+    {"tolerance": 0.15, "dimensions": 2,
+     "nodes": [{"name": "pi-1", "address": ["10.0.0.11", 50505],
+                "position": [0.0, 0.0, 1.5], "heading": 90.0}, ...]}
+
+position is in metres in the hall frame (x east, y north, z up) and
+heading is the compass bearing of the array x axis in degrees, used when
+the node runs without compass (see compass.py). The
+aggregator subscribes to every node with one UDP socket and keeps the recent
+estimates per node. New estimates within `tolerance` seconds of the first
+one are one event: once no more estimates of it can arrive (SETTLE), every
+node contributes its estimate closest in time to the start of the event,
+so an event heard by N nodes gives one position, not N. All events that
+settled in one pass are solved together as a batch of weighted least
+squares line intersections. Node clocks have to be synchronised (NTP/chrony) for the
+matching to work.
+
+`python -m sound_localisation triangulate --simulate` starts simulated
+nodes on loopback that publish bearings of a source moving around the hall.
+"""
+
+import bisect
+import collections
+import json
+import math
+import os
+import select
+import socket
+import threading
+import time
+import numpy as np
+
+from . import stream
+from .config import PACKAGE_DIR
+
+
+# === Aggregator Configuration ===
+CONFIG_FILE = os.path.join(PACKAGE_DIR, "nodes.json")
+TOLERANCE = 0.15        # Seconds between estimates of different nodes to match them
+MIN_NODES = 2           # Nodes needed for one position
+HISTORY = 5.0           # Seconds of estimates kept per node
+MIN_CONFIDENCE = 0.0    # Estimates below this GCC-PHAT confidence are ignored
+SETTLE = 0.5            # Seconds an estimate may take to arrive, an event is solved when no more can
+
+
+def load_config(path=CONFIG_FILE):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def bearing_vectors(phi, theta, heading, dimensions=3):
+    """Unit direction vectors in the hall frame.
+
+    phi and theta are the array angles in radians (phi from the array x
+    axis towards y, theta from the z axis), heading the compass bearing of
+    the array x axis in degrees. All arguments broadcast.
+    """
+    azimuth = np.pi / 2 - np.radians(heading) + phi
+    if dimensions == 2:
+        return np.stack((np.cos(azimuth), np.sin(azimuth)), axis=-1)
+    sin_theta = np.sin(theta)
+    return np.stack((sin_theta * np.cos(azimuth), sin_theta * np.sin(azimuth), np.cos(theta)), axis=-1)
+
+
+def triangulate(positions, directions, weights):
+    """Weighted least squares intersection of bearing lines.
+
+    positions and directions have shape (..., nodes, dims), weights
+    (..., nodes); a weight of 0 leaves a node out. Minimises the weighted
+    sum of squared distances from the point to every line by solving
+    sum(w (I - d d^T)) x = sum(w (I - d d^T) p) for all groups at once.
+    Returns the points (..., dims) and the RMS distance to the lines
+    (..., ), which is nan where the lines are (nearly) parallel.
+    """
+    dims = positions.shape[-1]
+    projectors = np.eye(dims) - directions[..., :, None] * directions[..., None, :]
+    weighted = projectors * weights[..., None, None]
+    A = weighted.sum(axis=-3)
+    b = np.einsum('...nij,...nj->...i', weighted, positions)
+
+    # Parallel lines make A singular, solve those with I and mark them invalid.
+    valid = np.linalg.eigvalsh(A)[..., 0] > 1e-6 * weights.sum(axis=-1)
+    A = np.where(valid[..., None, None], A, np.eye(dims))
+    points = np.linalg.solve(A, b[..., None])[..., 0]
+
+    offsets = np.einsum('...nij,...nj->...ni', projectors, points[..., None, :] - positions)
+    residual = np.sqrt((weights * np.sum(offsets ** 2, axis=-1)).sum(axis=-1) / weights.sum(axis=-1))
+    return points, np.where(valid, residual, np.nan)
+
+
+class Aggregator:
+    """Subscribe to all nodes and turn their estimates into positions."""
+
+    def __init__(self, config, tolerance=None):
+        self.nodes = config["nodes"]
+        self.tolerance = tolerance or config.get("tolerance", TOLERANCE)
+        self.dimensions = config.get("dimensions", 3)
+        self.positions = np.array([node["position"][:self.dimensions] for node in self.nodes], dtype=float)
+        self.headings = np.array([node.get("heading", 0.0) for node in self.nodes], dtype=float)
+        self.index = {}
+        for i, node in enumerate(self.nodes):
+            for info in socket.getaddrinfo(*node["address"], socket.AF_INET, socket.SOCK_DGRAM):
+                self.index[info[4]] = i
+        # Per node: timestamps, direction vectors, weights and SPL in arrival order.
+        self.history = [collections.deque() for _ in self.nodes]
+        self.times = [collections.deque() for _ in self.nodes]
+        self.pending = []           # Sorted timestamps of new estimates not solved yet
+        self.solved = -math.inf     # End of the last solved event, later estimates of it are dropped
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.last_renew = 0.0
+
+    def send(self, request):
+        for node in self.nodes:
+            try:
+                self.sock.sendto(request, tuple(node["address"]))
+            except OSError:
+                pass  # Node is down, it is asked again on the next renewal
+
+    def renew(self):
+        self.send(b"SUB")
+        self.last_renew = time.monotonic()
+
+    def close(self):
+        self.send(b"UNSUB")
+        self.sock.close()
+
+    def receive(self, timeout=stream.RENEW_INTERVAL):
+        """Read all waiting datagrams, return the list of (node, estimate)."""
+        if time.monotonic() - self.last_renew >= stream.RENEW_INTERVAL:
+            self.renew()
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        received = []
+        while ready:
+            try:
+                data, sender = self.sock.recvfrom(65536)
+            except (BlockingIOError, ConnectionRefusedError):
+                break
+            node = self.index.get(sender)
+            if node is not None:
+                received.extend((node, estimate) for estimate in stream.unpack_datagram(data))
+        return received
+
+    def add(self, received):
+        """Store new estimates and return the anchors to match on."""
+        anchors = []
+        for node, estimate in received:
+            if estimate.confidence < MIN_CONFIDENCE:
+                continue
+            heading = self.headings[node] if math.isnan(estimate.heading) else estimate.heading
+            direction = bearing_vectors(estimate.phi, estimate.theta, heading, self.dimensions)
+            entry = (estimate.timestamp, direction, max(estimate.confidence, 1e-3), max(estimate.spl, default=np.nan))
+            # Records arrive nearly in order, insert from the right.
+            position = bisect.bisect(self.times[node], estimate.timestamp)
+            self.times[node].insert(position, estimate.timestamp)
+            self.history[node].insert(position, entry)
+            anchors.append((node, estimate.timestamp))
+
+        newest = max((times[-1] for times in self.times if times), default=0.0)
+        for times, history in zip(self.times, self.history):
+            while times and times[0] < newest - HISTORY:
+                times.popleft()
+                history.popleft()
+        return anchors
+
+    def nearest(self, node, timestamp):
+        times = self.times[node]
+        position = bisect.bisect(times, timestamp)
+        best = None
+        for candidate in (position - 1, position):
+            if 0 <= candidate < len(times) and abs(times[candidate] - timestamp) <= self.tolerance:
+                if best is None or abs(times[candidate] - timestamp) < abs(times[best] - timestamp):
+                    best = candidate
+        return best
+
+    def settled(self, now):
+        """Split the pending timestamps into events of at most tolerance seconds
+        and return the start of every event no estimate can join anymore."""
+        events = []
+        while self.pending and self.pending[0] + self.tolerance + SETTLE <= now:
+            start = self.pending[0]
+            self.solved = start + self.tolerance
+            del self.pending[:bisect.bisect_right(self.pending, self.solved)]
+            events.append(start)
+        return events
+
+    def wait(self):
+        """Seconds to wait for estimates before the next event settles."""
+        if not self.pending:
+            return stream.RENEW_INTERVAL
+        due = self.pending[0] + self.tolerance + SETTLE - time.time()
+        return min(max(due, 0.0), stream.RENEW_INTERVAL)
+
+    def locate(self, events):
+        """Match every event start with all nodes and solve all events at once."""
+        count = len(self.nodes)
+        directions = np.zeros((len(events), count, self.dimensions))
+        weights = np.zeros((len(events), count))
+        spl = np.full((len(events), count), np.nan)
+        for group, timestamp in enumerate(events):
+            for node in range(count):
+                match = self.nearest(node, timestamp)
+                if match is not None:
+                    _, directions[group, node], weights[group, node], spl[group, node] = self.history[node][match]
+
+        used = (weights > 0).sum(axis=1)
+        keep = used >= MIN_NODES
+        if not keep.any():
+            return []
+        points, residual = triangulate(np.broadcast_to(self.positions, directions[keep].shape),
+                                       directions[keep], weights[keep])
+
+        results = []
+        kept = [timestamp for timestamp, k in zip(events, keep) if k]
+        for timestamp, point, error, nodes, levels in zip(kept, points, residual, used[keep], spl[keep]):
+            if np.isnan(error):
+                continue
+            results.append({"timestamp": timestamp, "position": point.round(3).tolist(),
+                            "residual": round(float(error), 3), "nodes": int(nodes),
+                            "spl": None if np.all(np.isnan(levels)) else round(float(np.nanmax(levels)), 1)})
+        return results
+
+    def __iter__(self):
+        while True:
+            for _, timestamp in self.add(self.receive(self.wait())):
+                if timestamp > self.solved:
+                    bisect.insort(self.pending, timestamp)
+            events = self.settled(time.time())
+            if events:
+                yield from self.locate(events)
+
+
+# === Simulation ===
+def simulate_nodes(config, rate=20.0, noise=1.0, stop=None):
+    """Publish bearings of a source circling the hall from every node in
+    config, on the node addresses. Blocks until stop is set."""
+    stop = stop or threading.Event()
+    dimensions = config.get("dimensions", 3)
+    publishers = []
+    for node in config["nodes"]:
+        publisher = stream.EstimatePublisher(tuple(node["address"]))
+        publisher.start()
+        publishers.append(publisher)
+    positions = np.array([node["position"] for node in config["nodes"]], dtype=float)
+    headings = np.array([node.get("heading", 0.0) for node in config["nodes"]], dtype=float)
+    center = positions.mean(axis=0)
+    radius = max(np.ptp(positions[:, 0]), np.ptp(positions[:, 1]), 1.0) / 3
+    rng = np.random.default_rng()
+
+    try:
+        while not stop.is_set():
+            now = time.time()
+            source = center + [radius * math.cos(now / 10), radius * math.sin(now / 10), 0.0]
+            if dimensions == 2:
+                source[2] = 0.0
+                positions[:, 2] = 0.0
+            offset = source - positions
+            azimuth = np.arctan2(offset[:, 1], offset[:, 0])
+            phi = azimuth - (np.pi / 2 - np.radians(headings)) + np.radians(rng.normal(0, noise, len(positions)))
+            theta = np.arctan2(np.hypot(offset[:, 0], offset[:, 1]), offset[:, 2])
+            for publisher, node_phi, node_theta in zip(publishers, phi, theta):
+                publisher.publish(now + rng.normal(0, 0.01), node_phi, node_theta, 0.8, [70.0] * 4)
+            stop.wait(1 / rate)
+    finally:
+        for publisher in publishers:
+            publisher.stop()
+
+
+def run(path=CONFIG_FILE, tolerance=None, simulate=False):
+    """Print the triangulated positions as JSON lines until interrupted."""
+    nodes = load_config(path)
+
+    stop = threading.Event()
+    if simulate:
+        threading.Thread(target=simulate_nodes, args=(nodes,), kwargs={"stop": stop}, daemon=True).start()
+
+    aggregator = Aggregator(nodes, tolerance)
+    try:
+        for result in aggregator:
+            print(json.dumps(result), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        aggregator.close()
@@ -0,0 +1,148 @@
+"""
+How accurate is the direction for different window lengths?
+
+Instead of reopening the stream for every window length, one long take is
+recorded per tone and stored in the output folder. evaluate() then cuts
+every window length, as a multiple of the wavelength, out of that take
+with strided views, so every cell gets up to MAX_WINDOWS windows at
+different offsets without recording again. The takes are memory mapped,
+so a window is only read when it is evaluated.
+
+With splits the same question is asked for "the max length split N
+times": every window is cut in N parts, the direction of every part is
+found as a unit vector and the vectors are averaged; phi and theta are
+those of the mean vector, and the confidence is the lowest of the parts.
+"""
+
+import csv
+import json
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import audio as audio_device
+from .localise import direction_to_angles, get_direction
+from .sweep import Capture, wrap_degrees
+
+
+# === Measurement Settings ===
+FREQ_REF = np.linspace(50, 5000, 10)  # 10 reference frequencies between 50 Hz and 5000 Hz
+WAVE_LENGTH_TIME = np.array([1, 5, 10, 50, 100, 500, 1000])  # Wavelength multipliers
+SPLITS = [1]                # Parts every window is split in, [1, 2, 4, 8] for max length v split length
+TAKE_WINDOWS = 3            # A take holds this many of the longest windows
+MIN_TAKE_SEC = 10           # but is at least this long
+MAX_WINDOWS = 200           # Windows evaluated per cell
+
+TAKES_FILE = "takes.json"
+RESULTS_FILE = "windows.csv"
+
+
+def take_name(freq):
+    return f"take_{freq:.0f}Hz.npy"
+
+
+def take_frames(freq):
+    longest = WAVE_LENGTH_TIME.max() * audio_device.SAMPLE_RATE / freq
+    return int(max(TAKE_WINDOWS * longest, MIN_TAKE_SEC * audio_device.SAMPLE_RATE))
+
+
+def load_takes(folder):
+    with open(os.path.join(folder, TAKES_FILE), 'r') as file:
+        return json.load(file)
+
+
+def record(folder, phi_ref=45, theta_ref=45):
+    """Record one take per tone in FREQ_REF, skipping the takes already in folder."""
+    os.makedirs(folder, exist_ok=True)
+    index_path = os.path.join(folder, TAKES_FILE)
+    if os.path.exists(index_path):
+        takes = load_takes(folder)
+        if (takes["phi"], takes["theta"]) != (phi_ref, theta_ref):
+            raise SystemExit(f"{folder} holds takes at phi {takes['phi']}, theta {takes['theta']}.")
+    else:
+        takes = {"phi": phi_ref, "theta": theta_ref, "sample_rate": audio_device.SAMPLE_RATE,
+                 "channels": audio_device.CHANNELS, "takes": {}}
+
+    audio = audio_device.open_audio()
+    capture = Capture(audio, audio_device.CHANNELS)
+    try:
+        for count, freq in enumerate(FREQ_REF):
+            name = take_name(freq)
+            if name in takes["takes"]:
+                continue
+            frames = take_frames(freq)
+            input(f"\n[{count + 1}/{len(FREQ_REF)}] Switch tone generator to {freq:.0f} Hz and press Enter...")
+            print(f"Recording {frames / audio_device.SAMPLE_RATE:.0f} seconds...")
+            take = np.empty((frames, audio_device.CHANNELS), dtype=np.int32)
+            capture.start()
+            capture.read(take)
+            capture.stop()
+
+            np.save(os.path.join(folder, name), take)
+            takes["takes"][name] = float(freq)
+            with open(index_path, 'w') as file:
+                json.dump(takes, file, indent=4)
+    except KeyboardInterrupt:
+        print("\nRecording interrupted, start it again to record the missing takes.")
+    finally:
+        capture.close()
+        audio.terminate()
+
+
+def window_starts(frames, length, max_windows=MAX_WINDOWS):
+    """Offsets of the windows of one cell: back to back, or spread over the
+    take when more than max_windows would fit."""
+    positions = frames - length + 1
+    step = max(length, (positions - 1) // max(max_windows - 1, 1), 1)
+    return range(0, positions, step)[:max_windows]
+
+
+def evaluate_cell(views, start, length, splits):
+    """phi, theta and confidence of the window at start: the unit direction
+    vectors of its splits parts are averaged, the confidence is the lowest."""
+    part = length // splits
+    directions = np.zeros((splits, 4))
+    for i in range(splits):
+        # views[k] is the (channels, length) window at offset k; no copy is made.
+        directions[i] = get_direction(views[start, :, i * part:(i + 1) * part].T)
+    x, y, z, _ = directions.mean(axis=0)
+    phi, theta = direction_to_angles(x, y, z)
+    return np.rad2deg(phi), np.rad2deg(theta), directions[:, 3].min()
+
+
+def evaluate(folder, splits=None, max_windows=MAX_WINDOWS):
+    """Evaluate every (frequency, length, splits) cell on the stored takes
+    and write every window to windows.csv."""
+    takes = load_takes(folder)
+    splits = splits or SPLITS
+    results_path = os.path.join(folder, RESULTS_FILE)
+    header = ["freq_ref", "wavelength multiplier", "splits", "offset",
+              "phi", "theta", "confidence", "phi_error", "theta_error"]
+
+    with open(results_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for name, freq in sorted(takes["takes"].items(), key=lambda item: item[1]):
+            # Not band filtered: GCC-PHAT whitens the spectrum, which would
+            # blow the filtered-out bands up again, and the demo doesn't filter either.
+            data = np.load(os.path.join(folder, name), mmap_mode='r')
+            for multiplier in WAVE_LENGTH_TIME:
+                length = int(multiplier * takes["sample_rate"] / freq)
+                if length > len(data):
+                    continue
+                views = sliding_window_view(data, length, axis=0)
+                for n in splits:
+                    if length // n < 2:
+                        continue
+                    errors = []
+                    for start in window_starts(len(data), length, max_windows):
+                        phi, theta, confidence = evaluate_cell(views, start, length, n)
+                        phi_error = wrap_degrees(phi - takes["phi"])
+                        theta_error = theta - takes["theta"]
+                        errors.append((abs(phi_error), abs(theta_error)))
+                        writer.writerow([freq, multiplier, n, start, f"{phi:.2f}", f"{theta:.2f}",
+                                         f"{confidence:.3f}", f"{phi_error:.2f}", f"{theta_error:.2f}"])
+                    phi_mae, theta_mae = np.mean(errors, axis=0)
+                    print(f"freq: {freq:.0f} Hz, length: {multiplier}, splits: {n}, windows: {len(errors)}, "
+                          f"|φ diff| {phi_mae:.2f}, |θ diff| {theta_mae:.2f}")
+    print(f"Saved to {results_path}")